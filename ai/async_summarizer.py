@@ -0,0 +1,102 @@
+import asyncio
+from config import Config
+from utils.async_http import attempt_timeout, gather_or_cancel, is_pool_timeout, is_transient_http_error
+from utils.resilience import ServiceBusy, UpstreamUnavailable
+from .summarizer import AISummarizer
+
+OPENAI_CHAT_URL = 'https://api.openai.com/v1/chat/completions'
+
+
+class AsyncAISummarizer(AISummarizer):
+    """AISummarizer whose summarize methods are coroutines
+
+    Chat completions go straight to the OpenAI REST API over the shared
+    httpx.AsyncClient. Files in a folder are summarized concurrently, and
+    text extraction runs in a worker thread so it does not block the loop.
+    """
+
+    def __init__(self, http, max_concurrent_files=4):
+        super().__init__()
+        self.http = http
+        self.max_concurrent_files = max_concurrent_files
+
+    async def _chat(self, prompt, timeout):
+        response = await self.http.post(
+            OPENAI_CHAT_URL,
+            headers={'Authorization': f'Bearer {Config.OPENAI_API_KEY}'},
+            json={
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": "You are a helpful assistant that provides concise summaries."},
+                    {"role": "user", "content": prompt}
+                ],
+                "max_tokens": 300,
+                "temperature": 0.3
+            },
+            timeout=attempt_timeout(self.http, timeout)
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def summarize_content(self, text, max_length=500, usage=None):
+        """Summarize text using AI; tokens spent are also added to usage['tokens'] if given"""
+        if not text or text.startswith("Error reading"):
+            return text
+
+        try:
+            prompt = f"Please provide a concise summary of the following content. Focus on key points and main ideas. Limit to {max_length} characters:\n\n{text}"
+
+            # Summaries have no side effects, so they are safe to retry
+            response = await self.upstream.acall(lambda timeout: self._chat(prompt, timeout),
+                                                 idempotent=True, is_transient=is_transient_http_error,
+                                                 is_local=is_pool_timeout)
+
+            tokens = response.get('usage', {}).get('total_tokens', 0)
+            with self._tokens_lock:
+                self.tokens_used += tokens
+            if usage is not None:
+                usage['tokens'] += tokens
+
+            summary = response['choices'][0]['message']['content'].strip()
+            return summary[:max_length]
+
+        except (UpstreamUnavailable, ServiceBusy):
+            raise
+        except Exception as e:
+            return f"Error generating summary: {str(e)}"
+
+    async def _summarize_file(self, drive_client, file):
+        text_content = ""
+
+        extract = self.extractor_for(file['mimeType'])
+        if extract is None:
+            text_content = f"File type not supported for summarization: {file['mimeType']}"
+        else:
+            file_content = await drive_client.download_file(file['id'], file['name'])
+            if file_content:
+                text_content = await asyncio.to_thread(extract, file_content)
+
+        if text_content and not text_content.startswith("Error") and not text_content.startswith("File type"):
+            summary = await self.summarize_content(text_content)
+            return f"📄 **{file['name']}:**\n{summary}\n\n"
+        return f"📄 **{file['name']}:** {text_content}\n\n"
+
+    async def summarize_folder(self, drive_client, folder_path, folder_id=None, files=None):
+        """Summarize all files in a folder; `files` is its listing if the caller already has it"""
+        if folder_id is None:
+            folder_id = await drive_client.get_folder_id(folder_path)
+
+        if files is None:
+            files = await drive_client.list_folder(folder_id)
+        if not files:
+            return "No files found in this folder to summarize."
+
+        limit = asyncio.Semaphore(self.max_concurrent_files)
+
+        async def summarize(file):
+            async with limit:
+                return await self._summarize_file(drive_client, file)
+
+        # A busy or unavailable upstream fails the summary, so stop downloading the other files
+        entries = await gather_or_cancel(*(summarize(file) for file in files))
+        return f"📊 Summary of files in '{folder_path}':\n\n" + ''.join(entries)
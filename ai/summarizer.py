@@ -2,12 +2,28 @@ import openai
 import PyPDF2
 import docx
 import os
+import threading
 from config import Config
+from utils.resilience import UpstreamUnavailable, get_upstream
+
+TRANSIENT_OPENAI_ERRORS = (
+    openai.error.Timeout,
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+    openai.error.RateLimitError,
+    openai.error.TryAgain,
+    openai.error.APIError,
+)
 
 class AISummarizer:
     def __init__(self):
         openai.api_key = Config.OPENAI_API_KEY
         self.model = Config.AI_MODEL
+        self.upstream = get_upstream('openai', 'OpenAI', default_timeout=Config.OPENAI_TIMEOUT_SECONDS,
+                                     min_timeout=10, max_timeout=Config.OPENAI_TIMEOUT_SECONDS * 2,
+                                     is_transient=lambda e: isinstance(e, TRANSIENT_OPENAI_ERRORS))
+        self.tokens_used = 0
+        self._tokens_lock = threading.Lock()
     
     def extract_text_from_pdf(self, file_content):
         """Extract text from PDF file"""
@@ -39,71 +55,86 @@ class AISummarizer:
             file_content.seek(0)
             return file_content.read().decode('latin-1')
     
-    def summarize_content(self, text, max_length=500):
-        """Summarize text using AI"""
+    def summarize_content(self, text, max_length=500, usage=None):
+        """Summarize text using AI; tokens spent are also added to usage['tokens'] if given"""
         if not text or text.startswith("Error reading"):
             return text
             
         try:
             prompt = f"Please provide a concise summary of the following content. Focus on key points and main ideas. Limit to {max_length} characters:\n\n{text}"
             
-            response = openai.ChatCompletion.create(
+            # Summaries have no side effects, so they are safe to retry
+            response = self.upstream.call(lambda timeout: openai.ChatCompletion.create(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant that provides concise summaries."},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=300,
-                temperature=0.3
-            )
+                temperature=0.3,
+                request_timeout=timeout
+            ), idempotent=True)
+            
+            tokens = response.get('usage', {}).get('total_tokens', 0)
+            with self._tokens_lock:
+                self.tokens_used += tokens
+            if usage is not None:
+                usage['tokens'] += tokens
             
             summary = response.choices[0].message.content.strip()
             return summary[:max_length]
             
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             return f"Error generating summary: {str(e)}"
     
-    def summarize_folder(self, drive_client, folder_path):
-        """Summarize all files in a folder"""
-        folder_id = drive_client.get_folder_id(folder_path)
+    def extractor_for(self, mime_type):
+        """Return the text extraction method for a MIME type, or None if unsupported"""
+        if mime_type == 'application/pdf':
+            return self.extract_text_from_pdf
+        if mime_type in ['application/vnd.openxmlformats-officedocument.wordprocessingml.document', 
+                         'application/msword']:
+            return self.extract_text_from_docx
+        if mime_type == 'text/plain':
+            return self.extract_text_from_txt
+        return None
+    
+    def summarize_folder(self, drive_client, folder_path, folder_id=None, should_continue=None, usage=None,
+                         files=None):
+        """Summarize all files in a folder
         
-        query = f"'{folder_id}' in parents and trashed=false"
-        results = drive_client.service.files().list(
-            q=query, 
-            spaces='drive',
-            fields='files(id, name, mimeType)'
-        ).execute()
+        `files` is the folder's listing if the caller already has it. `should_continue`, if given, is checked before each file; when it returns
+        False the summary is abandoned and None is returned. `usage` is passed
+        on to summarize_content() to count this summary's tokens.
+        """
+        if folder_id is None:
+            folder_id = drive_client.get_folder_id(folder_path)
         
-        files = results.get('files', [])
+        if files is None:
+            files = drive_client.list_folder(folder_id)
         if not files:
             return "No files found in this folder to summarize."
         
         summary_response = f"📊 Summary of files in '{folder_path}':\n\n"
         
         for file in files:
-            file_content = None
+            if should_continue is not None and not should_continue():
+                return None
             text_content = ""
             
             # Download and extract text based on file type
-            if file['mimeType'] == 'application/pdf':
-                file_content = drive_client.download_file(file['id'], file['name'])
-                if file_content:
-                    text_content = self.extract_text_from_pdf(file_content)
-            elif file['mimeType'] in ['application/vnd.openxmlformats-officedocument.wordprocessingml.document', 
-                                     'application/msword']:
-                file_content = drive_client.download_file(file['id'], file['name'])
-                if file_content:
-                    text_content = self.extract_text_from_docx(file_content)
-            elif file['mimeType'] == 'text/plain':
+            extract = self.extractor_for(file['mimeType'])
+            if extract is None:
+                text_content = f"File type not supported for summarization: {file['mimeType']}"
+            else:
                 file_content = drive_client.download_file(file['id'], file['name'])
                 if file_content:
-                    text_content = self.extract_text_from_txt(file_content)
-            else:
-                text_content = f"File type not supported for summarization: {file['mimeType']}"
+                    text_content = extract(file_content)
             
             # Generate summary
             if text_content and not text_content.startswith("Error") and not text_content.startswith("File type"):
-                summary = self.summarize_content(text_content)
+                summary = self.summarize_content(text_content, usage=usage)
                 summary_response += f"📄 **{file['name']}:**\n{summary}\n\n"
             else:
                 summary_response += f"📄 **{file['name']}:** {text_content}\n\n"
@@ -1,8 +1,12 @@
 from flask import Flask, request, jsonify
 import os
 from config import Config
+from assistant import HOME_PAGE, DriveAssistant
 from whatsapp.webhook import WhatsAppWebhook
 from whatsapp.message_parser import WhatsAppMessageParser
+from whatsapp.session import SessionStore
+from utils.scheduler import CommandScheduler
+from utils.prewarm import HotFolderTracker, Prewarmer, WarmCache
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -10,32 +14,55 @@ app.config.from_object(Config)
 # Initialize components
 whatsapp = WhatsAppWebhook()
 message_parser = WhatsAppMessageParser()
+session_store = SessionStore(Config.SESSION_MAX_USERS, Config.SESSION_TTL_SECONDS)
+scheduler = CommandScheduler(
+    workers=Config.SCHEDULER_WORKERS,
+    max_user_inflight=Config.SCHEDULER_MAX_USER_INFLIGHT,
+    max_user_queued=Config.SCHEDULER_MAX_USER_QUEUED,
+    bucket_capacity=Config.SCHEDULER_BUCKET_CAPACITY,
+    refill_per_second=Config.SCHEDULER_REFILL_PER_SECOND,
+)
+hot_folders = HotFolderTracker(state_file=Config.PREWARM_STATE_FILE)
+warm_cache = WarmCache(max_age_seconds=Config.PREWARM_MAX_AGE_SECONDS,
+                       untracked_max_age_seconds=Config.PREWARM_UNTRACKED_MAX_AGE_SECONDS)
+assistant = DriveAssistant(whatsapp, message_parser, scheduler, hot_folders, warm_cache)
 
 # Initialize Google Drive client with error handling
 drive_client = None
 ai_summarizer = None
+prewarmer = None
 
 try:
     from google_drive.drive_client import GoogleDriveClient
     from ai.summarizer import AISummarizer
 
-    drive_client = GoogleDriveClient(Config.GOOGLE_CREDENTIALS_FILE, Config.DRIVE_TOKEN_FILE)
+    drive_client = GoogleDriveClient(Config.GOOGLE_CREDENTIALS_FILE, Config.DRIVE_TOKEN_FILE,
+                                     walk_workers=Config.DRIVE_WALK_WORKERS,
+                                     timeout=Config.DRIVE_TIMEOUT_SECONDS)
     ai_summarizer = AISummarizer()
+
+    if Config.PREWARM_ENABLED:
+        prewarmer = Prewarmer(
+            drive_client, ai_summarizer, hot_folders, warm_cache, scheduler.is_busy,
+            top_n=Config.PREWARM_TOP_FOLDERS,
+            offpeak_hours=(Config.PREWARM_OFFPEAK_START_HOUR, Config.PREWARM_OFFPEAK_END_HOUR),
+            max_seconds_per_cycle=Config.PREWARM_MAX_SECONDS_PER_CYCLE,
+            token_budget_per_hour=Config.PREWARM_TOKEN_BUDGET_PER_HOUR,
+        )
+        prewarmer.start()
 except Exception as e:
     print(f"⚠️  Google Drive not available: {e}")
     print("📱 WhatsApp commands will work, but Drive features will be disabled")
 
+assistant.drive_client = drive_client
+assistant.ai_summarizer = ai_summarizer
+assistant.prewarmer = prewarmer
+
 
 @app.route('/webhook', methods=['GET', 'POST'])
 def webhook():
     if request.method == 'GET':
-        mode = request.args.get('hub.mode')
-        token = request.args.get('hub.verify_token')
-        challenge = request.args.get('hub.challenge')
-
-        if mode == 'subscribe' and token == Config.WHATSAPP_VERIFY_TOKEN:
-            return challenge
-        return 'Verification failed', 403
+        return assistant.verify_webhook(request.args)
 
     elif request.method == 'POST':
         data = request.get_json()
@@ -48,8 +75,14 @@ def webhook():
         return 'OK', 200
 
 
+@app.route('/drive/notifications', methods=['POST'])
+def drive_notifications():
+    """Receive Google Drive push notifications for a changes.watch channel"""
+    return assistant.drive_notification(request.headers)
+
+
 def process_user_message(webhook_data):
-    """Process user message and execute commands"""
+    """Parse the user's message and queue the command on the scheduler"""
     user_id = webhook_data['from']
 
     try:
@@ -57,93 +90,34 @@ def process_user_message(webhook_data):
             message = webhook_data['message']
             parsed = message_parser.parse_message(message)
 
-            response = execute_command(parsed)
-            whatsapp.send_message(user_id, response)
+            rejection = scheduler.submit(user_id, parsed['command'],
+                                         lambda: run_command(user_id, parsed))
+            if rejection:
+                whatsapp.send_message(user_id, rejection)
 
     except Exception as e:
         error_msg = f" Error processing your request: {str(e)}"
         whatsapp.send_message(user_id, error_msg)
 
 
-def execute_command(parsed_command):
-    """Execute the parsed command"""
-    command = parsed_command['command']
-
-    # Check if Drive is available for Drive-related commands
-    drive_commands = ['LIST', 'DELETE', 'MOVE', 'SUMMARY', 'RENAME', 'UPLOAD_TEXT']
-    if command in drive_commands and drive_client is None:
-        return " Google Drive is not configured. Please check the server setup."
-
-    try:
-        if command == 'LIST':
-            return drive_client.list_files(parsed_command['folder_path'])
-
-        elif command == 'DELETE':
-            return drive_client.delete_file(parsed_command['file_path'])
-
-        elif command == 'MOVE':
-            return drive_client.move_file(parsed_command['source_path'], parsed_command['dest_path'])
-
-        elif command == 'SUMMARY':
-            return ai_summarizer.summarize_folder(drive_client, parsed_command['folder_path'])
+def run_command(user_id, parsed):
+    """Execute a command on a scheduler worker thread and reply to the user"""
+    assistant.run_sync(assistant.run_command(user_id, parsed, session_store.get(user_id)))
 
-        elif command == 'RENAME':
-            return drive_client.rename_file(parsed_command['current_name'], parsed_command['new_name'])
 
-        elif command == 'HELP':
-            return message_parser.get_help_message()
-
-        elif command == 'UNKNOWN':
-            return f" Unknown command: {parsed_command['message']}\n\nType 'HELP' for available commands."
-
-    except Exception as e:
-        return f" Error executing command: {str(e)}"
+def execute_command(parsed_command, session=None):
+    """Execute the parsed command with the blocking clients and return the reply"""
+    return assistant.run_sync(assistant.execute(parsed_command, session))
 
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    drive_status = "connected" if drive_client else "disconnected"
-    return jsonify({
-        'status': 'healthy',
-        'service': 'WhatsApp Drive Assistant',
-        'drive_status': drive_status
-    })
+    return jsonify(assistant.health())
 
 
 @app.route('/')
 def home():
-    return """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>WhatsApp Drive Assistant</title>
-        <style>
-            body { font-family: Arial, sans-serif; max-width: 800px; margin: 50px auto; padding: 20px; }
-            .status { padding: 10px; border-radius: 5px; margin: 10px 0; }
-            .success { background: #d4edda; color: #155724; }
-            .info { background: #d1ecf1; color: #0c5460; }
-        </style>
-    </head>
-    <body>
-        <h1>🤖 WhatsApp Drive Assistant</h1>
-        <div class="status success">✅ Service is running</div>
-        <div class="status info">📞 Webhook: <a href="/webhook">/webhook</a></div>
-        <div class="status info">❤️ Health: <a href="/health">/health</a></div>
-
-        <h2>Available Commands:</h2>
-        <ul>
-            <li><code>HELP</code> - Show all commands</li>
-            <li><code>LIST /</code> - List root directory</li>
-            <li><code>SUMMARY /</code> - AI summary of files</li>
-            <li><code>DELETE /filename.pdf</code> - Delete a file</li>
-            <li><code>RENAME old.pdf new.pdf</code> - Rename file</li>
-            <li>Send file with caption: <code>UPLOAD /Folder filename.pdf</code></li>
-        </ul>
-
-        <p><strong>Ngrok URL:</strong> https://abc123-456.ngrok.io</p>
-    </body>
-    </html>
-    """
+    return HOME_PAGE
 
 
 if __name__ == '__main__':
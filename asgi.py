@@ -0,0 +1,157 @@
+"""ASGI variant of app.py: the same commands on an asyncio-native I/O path
+
+Run with:  uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Drive, OpenAI and WhatsApp calls share one pooled httpx.AsyncClient and
+commands run as tasks on an AsyncCommandScheduler, so a single process can
+keep thousands of commands waiting on network I/O. app.py remains the
+synchronous (WSGI) entry point; command handling lives in assistant.py.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse
+from starlette.routing import Route
+from config import Config
+from assistant import HOME_PAGE, DriveAssistant
+from whatsapp.async_webhook import AsyncWhatsAppWebhook
+from whatsapp.message_parser import WhatsAppMessageParser
+from whatsapp.session import SessionStore
+from utils.async_http import create_http_client
+from utils.scheduler import AsyncCommandScheduler
+from utils.prewarm import HotFolderTracker, Prewarmer, WarmCache
+
+message_parser = WhatsAppMessageParser()
+session_store = SessionStore(Config.SESSION_MAX_USERS, Config.SESSION_TTL_SECONDS)
+scheduler = AsyncCommandScheduler(
+    workers=Config.ASYNC_SCHEDULER_WORKERS,
+    max_expensive=Config.ASYNC_MAX_EXPENSIVE,
+    max_user_inflight=Config.SCHEDULER_MAX_USER_INFLIGHT,
+    max_user_queued=Config.SCHEDULER_MAX_USER_QUEUED,
+    bucket_capacity=Config.SCHEDULER_BUCKET_CAPACITY,
+    refill_per_second=Config.SCHEDULER_REFILL_PER_SECOND,
+)
+hot_folders = HotFolderTracker(state_file=Config.PREWARM_STATE_FILE)
+warm_cache = WarmCache(max_age_seconds=Config.PREWARM_MAX_AGE_SECONDS,
+                       untracked_max_age_seconds=Config.PREWARM_UNTRACKED_MAX_AGE_SECONDS)
+
+# Created in lifespan() once the event loop is running
+http = None
+whatsapp = None
+assistant = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global http, whatsapp, assistant
+
+    http = create_http_client(Config.ASYNC_MAX_CONNECTIONS, Config.ASYNC_MAX_KEEPALIVE_CONNECTIONS,
+                              Config.ASYNC_POOL_TIMEOUT_SECONDS)
+    whatsapp = AsyncWhatsAppWebhook(http)
+    assistant = DriveAssistant(whatsapp, message_parser, scheduler, hot_folders, warm_cache)
+    scheduler.start()
+
+    try:
+        from google_drive.auth import GoogleDriveAuth
+        from google_drive.async_drive_client import AsyncGoogleDriveClient
+        from ai.async_summarizer import AsyncAISummarizer
+
+        os.makedirs('tokens', exist_ok=True)
+        auth = GoogleDriveAuth(Config.GOOGLE_CREDENTIALS_FILE, Config.DRIVE_TOKEN_FILE)
+        await asyncio.to_thread(auth.authenticate)
+        assistant.drive_client = AsyncGoogleDriveClient(auth.creds, http, walk_workers=Config.DRIVE_WALK_WORKERS,
+                                                        timeout=Config.DRIVE_TIMEOUT_SECONDS)
+        assistant.ai_summarizer = AsyncAISummarizer(http, max_concurrent_files=Config.DRIVE_WALK_WORKERS)
+
+        if Config.PREWARM_ENABLED:
+            # Pre-warming is background work off the request path, so it keeps the synchronous clients
+            from google_drive.drive_client import GoogleDriveClient
+            from ai.summarizer import AISummarizer
+
+            assistant.prewarmer = Prewarmer(
+                GoogleDriveClient(Config.GOOGLE_CREDENTIALS_FILE, Config.DRIVE_TOKEN_FILE,
+                                  walk_workers=Config.DRIVE_WALK_WORKERS, timeout=Config.DRIVE_TIMEOUT_SECONDS),
+                AISummarizer(), hot_folders, warm_cache, scheduler.is_busy,
+                top_n=Config.PREWARM_TOP_FOLDERS,
+                offpeak_hours=(Config.PREWARM_OFFPEAK_START_HOUR, Config.PREWARM_OFFPEAK_END_HOUR),
+                max_seconds_per_cycle=Config.PREWARM_MAX_SECONDS_PER_CYCLE,
+                token_budget_per_hour=Config.PREWARM_TOKEN_BUDGET_PER_HOUR,
+            )
+            assistant.prewarmer.start()
+    except Exception as e:
+        print(f"⚠️  Google Drive not available: {e}")
+        print("📱 WhatsApp commands will work, but Drive features will be disabled")
+
+    yield
+
+    if assistant.prewarmer:
+        assistant.prewarmer.stop()
+    await scheduler.shutdown()
+    await http.aclose()
+
+
+async def webhook(request):
+    if request.method == 'GET':
+        body, status = assistant.verify_webhook(request.query_params)
+        return PlainTextResponse(body, status_code=status)
+
+    data = await request.json()
+    print("Received webhook:", data)
+
+    webhook_data = whatsapp.process_webhook(data)
+    if webhook_data:
+        await process_user_message(webhook_data)
+
+    return PlainTextResponse('OK')
+
+
+async def drive_notifications(request):
+    """Receive Google Drive push notifications for a changes.watch channel"""
+    body, status = assistant.drive_notification(request.headers)
+    return PlainTextResponse(body, status_code=status)
+
+
+async def process_user_message(webhook_data):
+    """Parse the user's message and queue the command on the scheduler"""
+    user_id = webhook_data['from']
+
+    try:
+        if webhook_data['type'] == 'text':
+            message = webhook_data['message']
+            parsed = message_parser.parse_message(message)
+
+            rejection = await scheduler.submit(
+                user_id, parsed['command'],
+                lambda: assistant.run_command(user_id, parsed, session_store.get(user_id)))
+            if rejection:
+                await whatsapp.send_message(user_id, rejection)
+
+    except Exception as e:
+        error_msg = f" Error processing your request: {str(e)}"
+        await whatsapp.send_message(user_id, error_msg)
+
+
+async def health_check(request):
+    return JSONResponse(assistant.health(mode='asgi'))
+
+
+async def home(request):
+    return HTMLResponse(HOME_PAGE)
+
+
+app = Starlette(
+    routes=[
+        Route('/webhook', webhook, methods=['GET', 'POST']),
+        Route('/drive/notifications', drive_notifications, methods=['POST']),
+        Route('/health', health_check, methods=['GET']),
+        Route('/', home, methods=['GET']),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=Config.PORT)
@@ -0,0 +1,368 @@
+import asyncio
+import hmac
+import inspect
+import time
+from config import Config
+from whatsapp.session import UserSession
+from utils.resilience import ServiceBusy, UpstreamUnavailable, upstream_health
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+HOME_PAGE = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>WhatsApp Drive Assistant</title>
+        <style>
+            body { font-family: Arial, sans-serif; max-width: 800px; margin: 50px auto; padding: 20px; }
+            .status { padding: 10px; border-radius: 5px; margin: 10px 0; }
+            .success { background: #d4edda; color: #155724; }
+            .info { background: #d1ecf1; color: #0c5460; }
+        </style>
+    </head>
+    <body>
+        <h1>🤖 WhatsApp Drive Assistant</h1>
+        <div class="status success">✅ Service is running</div>
+        <div class="status info">📞 Webhook: <a href="/webhook">/webhook</a></div>
+        <div class="status info">❤️ Health: <a href="/health">/health</a></div>
+
+        <h2>Available Commands:</h2>
+        <ul>
+            <li><code>HELP</code> - Show all commands</li>
+            <li><code>LIST /</code> - List root directory</li>
+            <li><code>CD /Folder</code> - Change current folder (relative paths and <code>#n</code> work after)</li>
+            <li><code>TREE /Folder 3</code> - Folder tree, 3 levels deep</li>
+            <li><code>COPY /Folder /Backup</code> - Copy a file or folder recursively</li>
+            <li><code>SUMMARY /</code> - AI summary of files (current folder if no path)</li>
+            <li><code>DELETE /filename.pdf</code> - Delete a file</li>
+            <li><code>RENAME old.pdf new.pdf</code> - Rename a file in the current folder (or <code>#n</code>)</li>
+            <li>Send file with caption: <code>UPLOAD /Folder filename.pdf</code></li>
+        </ul>
+
+        <p><strong>Ngrok URL:</strong> https://abc123-456.ngrok.io</p>
+    </body>
+    </html>
+    """
+
+
+class FolderNotFound(Exception):
+    def __init__(self, path):
+        super().__init__(f"Folder '{path}' not found.")
+        self.path = path
+
+
+async def _resolve(value):
+    """Await `value` if a client returned a coroutine, so one handler serves sync and async clients"""
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+class DriveAssistant:
+    """Command handling shared by the WSGI (app.py) and ASGI (asgi.py) entry points
+
+    Handlers are coroutines and every client call goes through _resolve().
+    app.py runs each command with asyncio.run() on a scheduler thread using
+    the blocking clients; asgi.py awaits it on its event loop with the async
+    clients. The entry points only add HTTP routing and scheduling.
+    """
+
+    DRIVE_COMMANDS = ['LIST', 'CD', 'TREE', 'DELETE', 'MOVE', 'COPY', 'SUMMARY', 'RENAME', 'UPLOAD_TEXT']
+
+    def __init__(self, whatsapp, message_parser, scheduler, hot_folders, warm_cache):
+        self.whatsapp = whatsapp
+        self.message_parser = message_parser
+        self.scheduler = scheduler
+        self.hot_folders = hot_folders
+        self.warm_cache = warm_cache
+        self.drive_client = None
+        self.ai_summarizer = None
+        self.prewarmer = None
+
+    def verify_webhook(self, args):
+        """Answer WhatsApp's webhook verification handshake; returns (body, status)"""
+        mode = args.get('hub.mode')
+        token = args.get('hub.verify_token')
+        challenge = args.get('hub.challenge')
+
+        if mode == 'subscribe' and token == Config.WHATSAPP_VERIFY_TOKEN:
+            return challenge, 200
+        return 'Verification failed', 403
+
+    def drive_notification(self, headers):
+        """Handle a Google Drive push notification for a changes.watch channel; returns (body, status)
+
+        Every notification triggers a change-log read and possibly a refresh, so
+        without a configured channel token the endpoint refuses all requests.
+        """
+        if not Config.DRIVE_CHANNEL_TOKEN:
+            return 'Drive notifications are not configured', 403
+        if not hmac.compare_digest(headers.get('X-Goog-Channel-Token', ''), Config.DRIVE_CHANNEL_TOKEN):
+            return 'Invalid channel token', 403
+
+        # The initial 'sync' message only confirms the channel was created. The
+        # notification does not say what changed; the change log does.
+        if headers.get('X-Goog-Resource-State') != 'sync':
+            if self.prewarmer:
+                self.prewarmer.poll_now()
+            else:
+                self.warm_cache.invalidate()
+
+        return 'OK', 200
+
+    def note_drive_change(self, item_ids=None, parent_ids=()):
+        """Drop warm results after Drive content changed and let the prewarmer refresh them
+
+        Without `item_ids` every warm result is dropped.
+        """
+        if self.prewarmer:
+            self.prewarmer.notify_change(item_ids, parent_ids)
+        elif item_ids is None:
+            self.warm_cache.invalidate()
+        else:
+            self.warm_cache.invalidate_items(item_ids, parent_ids)
+
+    def after_mutation(self, reply, item_ids=None, parent_ids=()):
+        """Invalidate warm results if the client reports a successful change; returns `reply`
+
+        The Drive clients start a reply with ✅ only when the change went through.
+        """
+        if reply.startswith('✅'):
+            self.note_drive_change(item_ids, parent_ids)
+        return reply
+
+    def health(self, **extra):
+        drive_status = "connected" if self.drive_client else "disconnected"
+        upstreams = upstream_health()
+        degraded = any(u['state'] != 'closed' for u in upstreams.values())
+        return {
+            'status': 'degraded' if degraded else 'healthy',
+            'service': 'WhatsApp Drive Assistant',
+            **extra,
+            'drive_status': drive_status,
+            'scheduler': self.scheduler.stats(),
+            'upstreams': upstreams,
+            'prewarm': self.prewarmer.stats() if self.prewarmer else None
+        }
+
+    async def run_command(self, user_id, parsed, session):
+        """Execute a command on a scheduler worker and reply to the user"""
+        try:
+            response = await self.execute(parsed, session)
+        except Exception as e:
+            response = f" Error processing your request: {str(e)}"
+        await _resolve(self.whatsapp.send_message(user_id, response))
+
+    @staticmethod
+    def run_sync(coroutine):
+        """Drive a handler to completion from a thread without an event loop (the WSGI workers)"""
+        return asyncio.run(coroutine)
+
+    async def resolve_folder(self, session, path, create=False):
+        """Resolve a folder path or `#n` reference to (absolute_path, folder_id)
+
+        Paths the session already knows (working folder, last listing and its
+        entries) are answered without touching Drive; paths below the working
+        folder are walked from its ID instead of from root. Missing folders
+        raise FolderNotFound unless `create` is set (MOVE destinations).
+        """
+        if path and path.startswith('#'):
+            item = session.result_at(path)
+            if item is None or item['mimeType'] != FOLDER_MIME_TYPE:
+                raise ValueError(f"{path} is not a folder in your last listing")
+            return item['path'], item['id']
+
+        absolute_path = session.resolve_path(path)
+        folder_id = session.known_folder_id(absolute_path)
+        if folder_id is None:
+            cwd_prefix = session.cwd.rstrip('/') + '/'
+            if session.cwd != '/' and absolute_path.startswith(cwd_prefix):
+                folder_id = await _resolve(self.drive_client.get_folder_id(
+                    absolute_path[len(cwd_prefix):], parent_id=session.cwd_id, create=create))
+            else:
+                folder_id = await _resolve(self.drive_client.get_folder_id(absolute_path, create=create))
+            if folder_id is None:
+                raise FolderNotFound(absolute_path)
+        return absolute_path, folder_id
+
+    async def resolve_parent(self, session, path):
+        """Split a file path into (absolute_path, parent_folder_id)"""
+        absolute_path = session.resolve_path(path)
+        parent_path = absolute_path.rsplit('/', 1)[0] or '/'
+        return absolute_path, (await self.resolve_folder(session, parent_path))[1]
+
+    def progress_reporter(self, session):
+        """Send throttled progress updates for long-running commands to the user
+
+        The reporter is called from inside the Drive client, so it is a coroutine
+        function for async clients and a plain function for blocking ones.
+        """
+        if session.user_id is None:
+            return None
+
+        last_sent = [time.monotonic()]
+
+        def due():
+            now = time.monotonic()
+            if now - last_sent[0] < Config.PROGRESS_INTERVAL_SECONDS:
+                return False
+            last_sent[0] = now
+            return True
+
+        if inspect.iscoroutinefunction(self.whatsapp.send_message):
+            async def report(message):
+                if due():
+                    await self.whatsapp.send_message(session.user_id, message)
+        else:
+            def report(message):
+                if due():
+                    self.whatsapp.send_message(session.user_id, message)
+
+        return report
+
+    async def list_folder(self, folder_id):
+        """Folder entries from the warm cache, or from Drive (and then cached)"""
+        cached = self.warm_cache.get('LIST', folder_id)
+        if cached:
+            return cached[0]
+        generation = self.warm_cache.generation(folder_id)
+        files = await _resolve(self.drive_client.list_folder(folder_id))
+        self.warm_cache.put('LIST', folder_id, files, generation, [f['id'] for f in files])
+        return files
+
+    @staticmethod
+    def missing_reference(reference):
+        return f" No item {reference} in your last listing. Send LIST first."
+
+    async def execute(self, parsed_command, session=None):
+        """Execute the parsed command"""
+        command = parsed_command['command']
+        if session is None:
+            session = UserSession(None)
+        drive_client = self.drive_client
+
+        # Check if Drive is available for Drive-related commands
+        if command in self.DRIVE_COMMANDS and drive_client is None:
+            return " Google Drive is not configured. Please check the server setup."
+
+        try:
+            if command == 'LIST':
+                folder_path, folder_id = await self.resolve_folder(session, parsed_command['folder_path'])
+                self.hot_folders.record('LIST', folder_path, folder_id)
+                files = await self.list_folder(folder_id)
+                session.remember_listing(folder_path, folder_id, files)
+                return drive_client.format_listing(folder_path, files)
+
+            elif command == 'CD':
+                folder_path, folder_id = await self.resolve_folder(session, parsed_command['folder_path'])
+                session.change_directory(folder_path, folder_id)
+                return f"📂 Current folder: {folder_path}"
+
+            elif command == 'PWD':
+                return f"📂 Current folder: {session.cwd}"
+
+            elif command == 'DELETE':
+                file_path = parsed_command['file_path']
+                if file_path.startswith('#'):
+                    item = session.result_at(file_path)
+                    if item is None:
+                        return self.missing_reference(file_path)
+                    reply = await _resolve(drive_client.delete_file_by_id(item['id'], item['path']))
+                    return self.after_mutation(reply, [item['id']])
+
+                file_path, folder_id = await self.resolve_parent(session, file_path)
+                item = await _resolve(drive_client.find_item(file_path, folder_id=folder_id))
+                if item is None:
+                    return f"File '{file_path}' not found."
+                reply = await _resolve(drive_client.delete_file_by_id(item['id'], file_path))
+                return self.after_mutation(reply, [item['id']], [folder_id])
+
+            elif command == 'MOVE':
+                # Find the source before resolving the destination, which creates missing folders
+                source_path = parsed_command['source_path']
+                if source_path.startswith('#'):
+                    item = session.result_at(source_path)
+                    if item is None:
+                        return self.missing_reference(source_path)
+                else:
+                    source_path, source_folder_id = await self.resolve_parent(session, source_path)
+                    item = await _resolve(drive_client.find_item(source_path, folder_id=source_folder_id))
+                    if item is None:
+                        return f"File '{source_path}' not found."
+
+                dest_path, dest_folder_id = await self.resolve_folder(session, parsed_command['dest_path'],
+                                                                      create=True)
+                reply = await _resolve(drive_client.move_file_by_id(item['id'], item['name'],
+                                                                    dest_folder_id, dest_path))
+                return self.after_mutation(reply, [item['id']], [dest_folder_id])
+
+            elif command == 'TREE':
+                depth = parsed_command['depth']
+                if depth is not None and depth < 1:
+                    return " Depth must be at least 1, e.g. `TREE . 2`."
+                folder_path, folder_id = await self.resolve_folder(session, parsed_command['folder_path'])
+                depth = min(Config.TREE_DEFAULT_DEPTH if depth is None else depth, Config.TREE_MAX_DEPTH)
+                return await _resolve(drive_client.tree(folder_path, folder_id, max_depth=depth,
+                                                        progress=self.progress_reporter(session)))
+
+            elif command == 'COPY':
+                source_path = parsed_command['source_path']
+                if source_path.startswith('#'):
+                    item = session.result_at(source_path)
+                    if item is None:
+                        return self.missing_reference(source_path)
+                    source_path = item['path']
+                else:
+                    source_path, source_folder_id = await self.resolve_parent(session, source_path)
+                    item = await _resolve(drive_client.find_item(source_path, folder_id=source_folder_id))
+                    if item is None:
+                        return f"File '{source_path}' not found."
+
+                dest_path, dest_folder_id = await self.resolve_folder(session, parsed_command['dest_path'])
+                reply = await _resolve(drive_client.copy_item(source_path, item, dest_path, dest_folder_id,
+                                                              progress=self.progress_reporter(session)))
+                return self.after_mutation(reply, [], [dest_folder_id])
+
+            elif command == 'SUMMARY':
+                folder_path, folder_id = await self.resolve_folder(session, parsed_command['folder_path'])
+                self.hot_folders.record('SUMMARY', folder_path, folder_id)
+                cached = self.warm_cache.get('SUMMARY', folder_id)
+                if cached:
+                    summary, stored_at = cached
+                    return summary.rstrip() + f"\n\n🕒 Prepared at {time.strftime('%H:%M', time.localtime(stored_at))}"
+
+                generation = self.warm_cache.generation(folder_id)
+                files = await self.list_folder(folder_id)
+                summary = await _resolve(self.ai_summarizer.summarize_folder(drive_client, folder_path,
+                                                                             folder_id=folder_id, files=files))
+                self.warm_cache.put('SUMMARY', folder_id, summary, generation, [f['id'] for f in files])
+                return summary
+
+            elif command == 'RENAME':
+                current_name = parsed_command['current_name']
+                if current_name.startswith('#'):
+                    item = session.result_at(current_name)
+                    if item is None:
+                        return self.missing_reference(current_name)
+                    current_name, parent_ids = item['path'], []
+                else:
+                    current_name, folder_id = await self.resolve_parent(session, current_name)
+                    item = await _resolve(drive_client.find_item(current_name, folder_id=folder_id))
+                    if item is None:
+                        return f"File '{current_name}' not found."
+                    parent_ids = [folder_id]
+
+                reply = await _resolve(drive_client.rename_file_by_id(item['id'], current_name,
+                                                                      parsed_command['new_name']))
+                return self.after_mutation(reply, [item['id']], parent_ids)
+
+            elif command == 'HELP':
+                return self.message_parser.get_help_message()
+
+            elif command == 'UNKNOWN':
+                return f" Unknown command: {parsed_command['message']}\n\nType 'HELP' for available commands."
+
+        except (FolderNotFound, UpstreamUnavailable, ServiceBusy) as e:
+            return f" {e}"
+        except Exception as e:
+            return f" Error executing command: {str(e)}"
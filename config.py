@@ -8,14 +8,54 @@ class Config:
     WHATSAPP_TOKEN = os.getenv('WHATSAPP_TOKEN')
     WHATSAPP_VERIFY_TOKEN = os.getenv('WHATSAPP_VERIFY_TOKEN')
     WHATSAPP_PHONE_NUMBER_ID = os.getenv('WHATSAPP_PHONE_NUMBER_ID')
+    WHATSAPP_TIMEOUT_SECONDS = int(os.getenv('WHATSAPP_TIMEOUT_SECONDS', 10))
     
     # Google Drive
     GOOGLE_CREDENTIALS_FILE = os.getenv('GOOGLE_CREDENTIALS_FILE', 'credentials.json')
     DRIVE_TOKEN_FILE = 'tokens/drive_token.json'
+    DRIVE_WALK_WORKERS = int(os.getenv('DRIVE_WALK_WORKERS', 4))
+    TREE_DEFAULT_DEPTH = int(os.getenv('TREE_DEFAULT_DEPTH', 3))
+    TREE_MAX_DEPTH = int(os.getenv('TREE_MAX_DEPTH', 10))
+    PROGRESS_INTERVAL_SECONDS = int(os.getenv('PROGRESS_INTERVAL_SECONDS', 15))
+    DRIVE_TIMEOUT_SECONDS = int(os.getenv('DRIVE_TIMEOUT_SECONDS', 30))
     
     # AI (OpenAI/Claude)
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     AI_MODEL = os.getenv('AI_MODEL', 'gpt-3.5-turbo')
+    OPENAI_TIMEOUT_SECONDS = int(os.getenv('OPENAI_TIMEOUT_SECONDS', 60))
+    
+    # Per-user conversation sessions
+    SESSION_TTL_SECONDS = int(os.getenv('SESSION_TTL_SECONDS', 1800))
+    SESSION_MAX_USERS = int(os.getenv('SESSION_MAX_USERS', 1000))
+    
+    # Command scheduling
+    SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', 4))
+    SCHEDULER_MAX_USER_INFLIGHT = int(os.getenv('SCHEDULER_MAX_USER_INFLIGHT', 1))
+    SCHEDULER_MAX_USER_QUEUED = int(os.getenv('SCHEDULER_MAX_USER_QUEUED', 10))
+    SCHEDULER_BUCKET_CAPACITY = int(os.getenv('SCHEDULER_BUCKET_CAPACITY', 30))
+    SCHEDULER_REFILL_PER_SECOND = float(os.getenv('SCHEDULER_REFILL_PER_SECOND', 0.5))
+    
+    # ASGI variant (asgi.py)
+    ASYNC_SCHEDULER_WORKERS = int(os.getenv('ASYNC_SCHEDULER_WORKERS', 256))
+    ASYNC_MAX_CONNECTIONS = int(os.getenv('ASYNC_MAX_CONNECTIONS', 100))
+    ASYNC_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('ASYNC_MAX_KEEPALIVE_CONNECTIONS', 20))
+    ASYNC_POOL_TIMEOUT_SECONDS = int(os.getenv('ASYNC_POOL_TIMEOUT_SECONDS', 30))
+    # TREE/COPY/SUMMARY running at once; each keeps up to DRIVE_WALK_WORKERS requests in flight
+    ASYNC_MAX_EXPENSIVE = int(os.getenv('ASYNC_MAX_EXPENSIVE', 16))
+    
+    # Background pre-warming of hot folders
+    PREWARM_ENABLED = os.getenv('PREWARM_ENABLED', 'true').lower() == 'true'
+    PREWARM_TOP_FOLDERS = int(os.getenv('PREWARM_TOP_FOLDERS', 20))
+    PREWARM_OFFPEAK_START_HOUR = int(os.getenv('PREWARM_OFFPEAK_START_HOUR', 5))
+    PREWARM_OFFPEAK_END_HOUR = int(os.getenv('PREWARM_OFFPEAK_END_HOUR', 7))
+    # Long enough for results prepared in the off-peak window to last through the working day
+    PREWARM_MAX_AGE_SECONDS = int(os.getenv('PREWARM_MAX_AGE_SECONDS', 12 * 3600))
+    # Used instead while Drive changes are not being tracked
+    PREWARM_UNTRACKED_MAX_AGE_SECONDS = int(os.getenv('PREWARM_UNTRACKED_MAX_AGE_SECONDS', 60))
+    PREWARM_MAX_SECONDS_PER_CYCLE = int(os.getenv('PREWARM_MAX_SECONDS_PER_CYCLE', 300))
+    PREWARM_TOKEN_BUDGET_PER_HOUR = int(os.getenv('PREWARM_TOKEN_BUDGET_PER_HOUR', 20000))
+    PREWARM_STATE_FILE = os.getenv('PREWARM_STATE_FILE', 'tokens/hot_folders.json')
+    DRIVE_CHANNEL_TOKEN = os.getenv('DRIVE_CHANNEL_TOKEN')
     
     # Flask
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key')
@@ -0,0 +1,340 @@
+import asyncio
+import io
+import time
+import httpx
+from google.auth.transport.requests import Request
+from utils.async_http import attempt_timeout, gather_or_cancel, is_pool_timeout, is_transient_http_error
+from utils.resilience import ServiceBusy, UpstreamUnavailable, get_upstream
+from .drive_client import (FOLDER_MIME_TYPE, copy_report, count_descendants, format_listing, render_tree,
+                           sort_children)
+
+DRIVE_FILES_URL = 'https://www.googleapis.com/drive/v3/files'
+
+
+class AsyncGoogleDriveClient:
+    """Drive v3 REST client on a shared httpx.AsyncClient
+
+    Mirrors GoogleDriveClient method for method, but every method is a
+    coroutine, so a single event loop can keep many Drive calls in flight.
+    """
+
+    WALK_BATCH_SIZE = 40
+
+    def __init__(self, credentials, http, walk_workers=4, timeout=30):
+        self.credentials = credentials
+        self.http = http
+        self.walk_workers = walk_workers
+        self.upstream = get_upstream('drive', 'Google Drive', default_timeout=timeout,
+                                     min_timeout=5, max_timeout=timeout * 2)
+        self._refresh_lock = asyncio.Lock()
+
+    async def _headers(self):
+        if not self.credentials.valid:
+            async with self._refresh_lock:
+                if not self.credentials.valid:
+                    # google-auth only ships a blocking refresh
+                    await asyncio.to_thread(self.credentials.refresh, Request())
+        return {'Authorization': f'Bearer {self.credentials.token}'}
+
+    async def request(self, method, url, idempotent=True, **kwargs):
+        """Send a Drive API request with an adaptive timeout, retries and circuit breaker"""
+        async def attempt(timeout):
+            response = await self.http.request(method, url, headers=await self._headers(),
+                                               timeout=attempt_timeout(self.http, timeout), **kwargs)
+            response.raise_for_status()
+            return response
+
+        return await self.upstream.acall(attempt, idempotent=idempotent, is_transient=is_transient_http_error,
+                                         is_local=is_pool_timeout)
+
+    async def _json(self, method, url, idempotent=True, **kwargs):
+        response = await self.request(method, url, idempotent=idempotent, **kwargs)
+        return response.json() if response.content else {}
+
+    async def get_folder_id(self, folder_path, parent_id='root', create=True):
+        """Get folder ID from path, walking down from parent_id; None if missing and not `create`"""
+        if folder_path == '/':
+            return 'root'
+
+        current_id = parent_id
+        for folder_name in folder_path.strip('/').split('/'):
+            if not folder_name:
+                continue
+
+            query = f"name='{folder_name}' and mimeType='{FOLDER_MIME_TYPE}' and '{current_id}' in parents and trashed=false"
+            results = await self._json('GET', DRIVE_FILES_URL,
+                                       params={'q': query, 'spaces': 'drive', 'fields': 'files(id, name)'})
+            items = results.get('files', [])
+
+            if not items:
+                if not create:
+                    return None
+                # Folder doesn't exist, create it
+                current_id = await self._create_folder(folder_name, current_id)
+            else:
+                current_id = items[0]['id']
+
+        return current_id
+
+    async def list_files(self, folder_path='/'):
+        """List files in a folder"""
+        folder_id = await self.get_folder_id(folder_path)
+        return format_listing(folder_path, await self.list_folder(folder_id))
+
+    async def list_folder(self, folder_id):
+        """Return the raw file entries of a folder by ID"""
+        results = await self._json('GET', DRIVE_FILES_URL, params={
+            'q': f"'{folder_id}' in parents and trashed=false",
+            'spaces': 'drive',
+            'fields': 'files(id, name, mimeType, size, modifiedTime)',
+            'orderBy': 'name'
+        })
+        return results.get('files', [])
+
+    def format_listing(self, folder_path, files):
+        """Format folder entries as a numbered WhatsApp message"""
+        return format_listing(folder_path, files)
+
+    async def find_item(self, file_path, folder_id=None):
+        """Look up a single file or folder by path; returns the Drive entry or None"""
+        folder_path = '/'.join(file_path.split('/')[:-1])
+        file_name = file_path.split('/')[-1]
+        if folder_id is None:
+            folder_id = await self.get_folder_id(folder_path or '/')
+
+        results = await self._json('GET', DRIVE_FILES_URL, params={
+            'q': f"name='{file_name}' and '{folder_id}' in parents and trashed=false",
+            'fields': 'files(id, name, mimeType)'
+        })
+        items = results.get('files', [])
+        return items[0] if items else None
+
+    async def delete_file(self, file_path, folder_id=None):
+        """Delete a file or folder"""
+        item = await self.find_item(file_path if '/' in file_path else f"/{file_path}", folder_id=folder_id)
+        if item is None:
+            return f"File '{file_path}' not found."
+        return await self.delete_file_by_id(item['id'], file_path)
+
+    async def delete_file_by_id(self, file_id, display_name):
+        """Delete a file or folder whose ID is already known"""
+        url = f"{DRIVE_FILES_URL}/{file_id}"
+        attempts = 0
+
+        async def delete(timeout):
+            nonlocal attempts
+            attempts += 1
+            try:
+                response = await self.http.request('DELETE', url, headers=await self._headers(),
+                                                   timeout=attempt_timeout(self.http, timeout))
+                response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                # A retry after a timed-out attempt that did go through finds the file gone
+                if e.response.status_code != 404 or attempts == 1:
+                    raise
+
+        try:
+            await self.upstream.acall(delete, idempotent=True, is_transient=is_transient_http_error,
+                                      is_local=is_pool_timeout)
+            return f"✅ Successfully deleted '{display_name}'"
+        except Exception as e:
+            return f"❌ Error deleting file: {str(e)}"
+
+    async def move_file(self, source_path, dest_folder_path, source_folder_id=None, dest_folder_id=None):
+        """Move file to another folder"""
+        item = await self.find_item(source_path, folder_id=source_folder_id)
+        if item is None:
+            return f"File '{source_path}' not found."
+
+        if dest_folder_id is None:
+            dest_folder_id = await self.get_folder_id(dest_folder_path)
+        return await self.move_file_by_id(item['id'], item['name'], dest_folder_id, dest_folder_path)
+
+    async def move_file_by_id(self, file_id, file_name, dest_folder_id, dest_folder_path):
+        """Move a file whose ID and destination folder ID are already known"""
+        try:
+            file = await self._json('GET', f"{DRIVE_FILES_URL}/{file_id}", params={'fields': 'parents'})
+            previous_parents = ",".join(file.get('parents', []))
+
+            await self.request('PATCH', f"{DRIVE_FILES_URL}/{file_id}", json={}, params={
+                'addParents': dest_folder_id,
+                'removeParents': previous_parents,
+                'fields': 'id, parents'
+            })
+
+            return f"✅ Successfully moved '{file_name}' to '{dest_folder_path}'"
+        except Exception as e:
+            return f"❌ Error moving file: {str(e)}"
+
+    async def rename_file(self, current_name, new_name):
+        """Rename a file"""
+        results = await self._json('GET', DRIVE_FILES_URL, params={
+            'q': f"name='{current_name}' and trashed=false",
+            'fields': 'files(id)'
+        })
+        items = results.get('files', [])
+
+        if not items:
+            return f"File '{current_name}' not found."
+
+        return await self.rename_file_by_id(items[0]['id'], current_name, new_name)
+
+    async def rename_file_by_id(self, file_id, display_name, new_name):
+        """Rename a file or folder whose ID is already known"""
+        try:
+            await self.request('PATCH', f"{DRIVE_FILES_URL}/{file_id}", json={'name': new_name})
+            return f"✅ Successfully renamed '{display_name}' to '{new_name}'"
+        except Exception as e:
+            return f"❌ Error renaming file: {str(e)}"
+
+    async def download_file(self, file_id, file_name):
+        """Download file content for processing"""
+        try:
+            response = await self.request('GET', f"{DRIVE_FILES_URL}/{file_id}", params={'alt': 'media'})
+            return io.BytesIO(response.content)
+        except (UpstreamUnavailable, ServiceBusy):
+            raise
+        except Exception as e:
+            return None
+
+    async def _list_children_batch(self, parent_ids):
+        """List the children of several folders with one paged query"""
+        parents_clause = ' or '.join(f"'{parent_id}' in parents" for parent_id in parent_ids)
+        params = {
+            'q': f"({parents_clause}) and trashed=false",
+            'spaces': 'drive',
+            'fields': 'nextPageToken, files(id, name, mimeType, parents)',
+            'pageSize': 1000
+        }
+
+        children = []
+        while True:
+            results = await self._json('GET', DRIVE_FILES_URL, params=params)
+            children.extend(results.get('files', []))
+            if not results.get('nextPageToken'):
+                return children
+            params['pageToken'] = results['nextPageToken']
+
+    async def walk_tree(self, root_id, max_depth=None, progress=None):
+        """Breadth-first walk below root_id, batching each level's parent queries
+
+        `progress`, if given, is a coroutine function called with a status line per level.
+        """
+        children_by_parent = {}
+        level = [root_id]
+        seen = {root_id}
+        depth = 0
+        scanned = 0
+        limit = asyncio.Semaphore(self.walk_workers)
+
+        async def list_batch(batch):
+            async with limit:
+                return await self._list_children_batch(batch)
+
+        while level and (max_depth is None or depth < max_depth):
+            batches = [level[i:i + self.WALK_BATCH_SIZE] for i in range(0, len(level), self.WALK_BATCH_SIZE)]
+            level_ids = set(level)
+            next_level = []
+
+            for children in await gather_or_cancel(*(list_batch(batch) for batch in batches)):
+                for child in children:
+                    # An item with parents in several batches comes back once per batch
+                    if child['id'] in seen:
+                        continue
+                    seen.add(child['id'])
+                    for parent_id in child.get('parents', []):
+                        if parent_id in level_ids:
+                            children_by_parent.setdefault(parent_id, []).append(child)
+                    if child['mimeType'] == FOLDER_MIME_TYPE:
+                        next_level.append(child['id'])
+                scanned += len(children)
+
+            depth += 1
+            level = next_level
+            if progress:
+                await progress(f"🔎 Scanned {scanned} items, {depth} level(s) deep...")
+
+        sort_children(children_by_parent)
+        return children_by_parent
+
+    async def tree(self, folder_path, folder_id, max_depth=3, progress=None, max_chars=3500):
+        """Render a folder tree as a WhatsApp message"""
+        started = time.monotonic()
+        children_by_parent = await self.walk_tree(folder_id, max_depth=max_depth, progress=progress)
+        return render_tree(folder_path, folder_id, children_by_parent, max_depth,
+                           time.monotonic() - started, max_chars)
+
+    async def copy_item(self, source_path, source_item, dest_folder_path, dest_folder_id, progress=None):
+        """Copy a file, or a folder recursively, into the destination folder"""
+        started = time.monotonic()
+
+        if source_item['mimeType'] != FOLDER_MIME_TYPE:
+            if await self._copy_file(source_item, dest_folder_id):
+                return f"✅ Successfully copied '{source_path}' to '{dest_folder_path}'"
+            return f"❌ Error copying file '{source_path}'"
+
+        children_by_parent = await self.walk_tree(source_item['id'], progress=progress)
+        root_copy_id = await self._copy_folder(source_item, dest_folder_id)
+        if root_copy_id is None:
+            return f"❌ Error copying folder '{source_path}'"
+        new_ids = {source_item['id']: root_copy_id}
+        copied_folders, copied_files, failed = 1, 0, 0
+        limit = asyncio.Semaphore(self.walk_workers)
+
+        async def limited(coroutine):
+            async with limit:
+                return await coroutine
+
+        # Recreate the tree level by level: folders first so their children have a parent to land in
+        level = [source_item['id']]
+        while level:
+            folder_jobs, file_jobs = [], []
+            for parent_id in level:
+                for child in children_by_parent.get(parent_id, []):
+                    job = (child, new_ids[parent_id])
+                    (folder_jobs if child['mimeType'] == FOLDER_MIME_TYPE else file_jobs).append(job)
+
+            new_folders = await asyncio.gather(*(limited(self._copy_folder(child, parent))
+                                                 for child, parent in folder_jobs))
+            for (child, _), new_id in zip(folder_jobs, new_folders):
+                if new_id is None:
+                    # Nothing below a folder that could not be created gets copied
+                    failed += 1 + count_descendants(children_by_parent, child['id'])
+                else:
+                    new_ids[child['id']] = new_id
+                    copied_folders += 1
+
+            for ok in await asyncio.gather(*(limited(self._copy_file(child, parent)) for child, parent in file_jobs)):
+                if ok:
+                    copied_files += 1
+                else:
+                    failed += 1
+
+            level = [child['id'] for child, _ in folder_jobs if child['id'] in new_ids]
+            if progress and level:
+                await progress(f"📦 Copied {copied_folders} folders and {copied_files} files so far...")
+
+        return copy_report(source_path, dest_folder_path, copied_folders, copied_files, failed,
+                           time.monotonic() - started)
+
+    async def _create_folder(self, name, parent_id):
+        folder_metadata = {'name': name, 'mimeType': FOLDER_MIME_TYPE, 'parents': [parent_id]}
+        folder = await self._json('POST', DRIVE_FILES_URL, idempotent=False,
+                                  json=folder_metadata, params={'fields': 'id'})
+        return folder.get('id')
+
+    async def _copy_folder(self, item, parent_id):
+        try:
+            return await self._create_folder(item['name'], parent_id)
+        except Exception as e:
+            print(f"Error creating folder {item['name']}: {e}")
+            return None
+
+    async def _copy_file(self, item, parent_id):
+        try:
+            await self.request('POST', f"{DRIVE_FILES_URL}/{item['id']}/copy", idempotent=False,
+                               json={'name': item['name'], 'parents': [parent_id]}, params={'fields': 'id'})
+            return True
+        except Exception as e:
+            print(f"Error copying {item['name']}: {e}")
+            return False
@@ -1,36 +1,80 @@
 import io
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httplib2
+import google_auth_httplib2
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
+from utils.resilience import UpstreamUnavailable, get_upstream, is_rate_limit_error
 from .auth import GoogleDriveAuth
 
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+
 class GoogleDriveClient:
-    def __init__(self, credentials_file, token_file):
-        self.service = GoogleDriveAuth(credentials_file, token_file).authenticate()
+    # Parent IDs per batched `'<id>' in parents or ...` query, kept well under Drive's query length limit
+    WALK_BATCH_SIZE = 40
+    
+    def __init__(self, credentials_file, token_file, walk_workers=4, timeout=30):
+        auth = GoogleDriveAuth(credentials_file, token_file)
+        self.service = auth.authenticate()
+        self.credentials = auth.creds
+        self.walk_workers = walk_workers
+        self.upstream = get_upstream('drive', 'Google Drive', default_timeout=timeout,
+                                     min_timeout=5, max_timeout=timeout * 2,
+                                     is_transient=_is_transient_drive_error)
+        self._local = threading.local()
+    
+    def _thread_http(self, timeout=None):
+        """Authorized HTTP transport for the current thread (httplib2 is not thread-safe)"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http())
+        if timeout is not None:
+            # httplib2 applies its timeout when connecting, so update pooled connections too
+            http.http.timeout = timeout
+            for conn in http.http.connections.values():
+                conn.timeout = timeout
+                if getattr(conn, 'sock', None) is not None:
+                    conn.sock.settimeout(timeout)
+        return http
+    
+    def execute(self, request, idempotent=True):
+        """Execute a Drive API request with an adaptive timeout, retries and circuit breaker"""
+        return self.upstream.call(lambda timeout: request.execute(http=self._thread_http(timeout)),
+                                  idempotent=idempotent, is_transient=_is_transient_drive_error)
     
-    def get_folder_id(self, folder_path):
-        """Get folder ID from path"""
+    def get_folder_id(self, folder_path, parent_id='root', create=True):
+        """Get folder ID from path, walking down from parent_id
+
+        Missing folders are created unless `create` is False, in which case None is returned.
+        """
         if folder_path == '/':
             return 'root'
             
         folders = folder_path.strip('/').split('/')
-        current_id = 'root'
+        current_id = parent_id
         
         for folder_name in folders:
             if not folder_name:
                 continue
                 
             query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and '{current_id}' in parents and trashed=false"
-            results = self.service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
+            results = self.execute(self.service.files().list(q=query, spaces='drive', fields='files(id, name)'))
             items = results.get('files', [])
             
             if not items:
+                if not create:
+                    return None
                 # Folder doesn't exist, create it
                 folder_metadata = {
                     'name': folder_name,
                     'mimeType': 'application/vnd.google-apps.folder',
                     'parents': [current_id]
                 }
-                folder = self.service.files().create(body=folder_metadata, fields='id').execute()
+                folder = self.execute(self.service.files().create(body=folder_metadata, fields='id'), idempotent=False)
                 current_id = folder.get('id')
             else:
                 current_id = items[0]['id']
@@ -40,99 +84,302 @@ class GoogleDriveClient:
     def list_files(self, folder_path='/'):
         """List files in a folder"""
         folder_id = self.get_folder_id(folder_path)
-        
+        return self.format_listing(folder_path, self.list_folder(folder_id))
+    
+    def list_folder(self, folder_id):
+        """Return the raw file entries of a folder by ID"""
         query = f"'{folder_id}' in parents and trashed=false"
-        results = self.service.files().list(
+        results = self.execute(self.service.files().list(
             q=query, 
             spaces='drive',
             fields='files(id, name, mimeType, size, modifiedTime)',
             orderBy='name'
-        ).execute()
-        
-        files = results.get('files', [])
-        if not files:
-            return "No files found in this folder."
+        ))
         
-        response = f"Files in '{folder_path}':\n"
-        for file in files:
-            file_type = "📁" if file['mimeType'] == 'application/vnd.google-apps.folder' else "📄"
-            response += f"{file_type} {file['name']}\n"
+        return results.get('files', [])
+    
+    def get_changes_start_token(self):
+        """Page token marking "now" in the Drive change log"""
+        return self.execute(self.service.changes().getStartPageToken())['startPageToken']
+    
+    def list_changes(self, page_token):
+        """Return (changes, next_page_token) for everything that changed since page_token
         
-        return response
+        Each change has the item's `fileId` and, unless it was removed, its `file` with current parents.
+        """
+        changes = []
+        while True:
+            results = self.execute(self.service.changes().list(
+                pageToken=page_token,
+                spaces='drive',
+                fields='nextPageToken, newStartPageToken, changes(fileId, removed, file(id, parents, mimeType))',
+                pageSize=1000
+            ))
+            changes.extend(results.get('changes', []))
+            if 'newStartPageToken' in results:
+                return changes, results['newStartPageToken']
+            page_token = results['nextPageToken']
+    
+    def format_listing(self, folder_path, files):
+        """Format folder entries as a numbered WhatsApp message"""
+        return format_listing(folder_path, files)
     
-    def delete_file(self, file_path):
+    def delete_file(self, file_path, folder_id=None):
         """Delete a file or folder"""
         if '/' in file_path:
             folder_path = '/'.join(file_path.split('/')[:-1])
             file_name = file_path.split('/')[-1]
-            folder_id = self.get_folder_id(folder_path)
+            if folder_id is None:
+                folder_id = self.get_folder_id(folder_path or '/')
             
             query = f"name='{file_name}' and '{folder_id}' in parents and trashed=false"
         else:
             query = f"name='{file_path}' and 'root' in parents and trashed=false"
         
-        results = self.service.files().list(q=query, fields='files(id)').execute()
+        results = self.execute(self.service.files().list(q=query, fields='files(id)'))
         items = results.get('files', [])
         
         if not items:
             return f"File '{file_path}' not found."
         
+        return self.delete_file_by_id(items[0]['id'], file_path)
+    
+    def delete_file_by_id(self, file_id, display_name):
+        """Delete a file or folder whose ID is already known"""
+        request = self.service.files().delete(fileId=file_id)
+        attempts = [0]
+        
+        def delete(timeout):
+            attempts[0] += 1
+            try:
+                return request.execute(http=self._thread_http(timeout))
+            except HttpError as e:
+                # A retry after a timed-out attempt that did go through finds the file gone
+                if e.resp.status == 404 and attempts[0] > 1:
+                    return None
+                raise
+        
         try:
-            self.service.files().delete(fileId=items[0]['id']).execute()
-            return f"✅ Successfully deleted '{file_path}'"
+            self.upstream.call(delete, idempotent=True, is_transient=_is_transient_drive_error)
+            return f"✅ Successfully deleted '{display_name}'"
         except Exception as e:
             return f"❌ Error deleting file: {str(e)}"
     
-    def move_file(self, source_path, dest_folder_path):
+    def move_file(self, source_path, dest_folder_path, source_folder_id=None, dest_folder_id=None):
         """Move file to another folder"""
         # Extract file name and source folder
         source_folder_path = '/'.join(source_path.split('/')[:-1])
         file_name = source_path.split('/')[-1]
         
         # Get source folder ID and file
-        source_folder_id = self.get_folder_id(source_folder_path or '/')
+        if source_folder_id is None:
+            source_folder_id = self.get_folder_id(source_folder_path or '/')
         query = f"name='{file_name}' and '{source_folder_id}' in parents and trashed=false"
-        results = self.service.files().list(q=query, fields='files(id, parents)').execute()
+        results = self.execute(self.service.files().list(q=query, fields='files(id, parents)'))
         items = results.get('files', [])
         
         if not items:
             return f"File '{source_path}' not found."
         
         file_id = items[0]['id']
-        dest_folder_id = self.get_folder_id(dest_folder_path)
-        
+        if dest_folder_id is None:
+            dest_folder_id = self.get_folder_id(dest_folder_path)
+        return self.move_file_by_id(file_id, file_name, dest_folder_id, dest_folder_path)
+    
+    def move_file_by_id(self, file_id, file_name, dest_folder_id, dest_folder_path):
+        """Move a file whose ID and destination folder ID are already known"""
         try:
             # Get current parents to remove
-            file = self.service.files().get(fileId=file_id, fields='parents').execute()
+            file = self.execute(self.service.files().get(fileId=file_id, fields='parents'))
             previous_parents = ",".join(file.get('parents', []))
             
             # Move the file
-            self.service.files().update(
+            self.execute(self.service.files().update(
                 fileId=file_id,
                 addParents=dest_folder_id,
                 removeParents=previous_parents,
                 fields='id, parents'
-            ).execute()
+            ))
             
             return f"✅ Successfully moved '{file_name}' to '{dest_folder_path}'"
         except Exception as e:
             return f"❌ Error moving file: {str(e)}"
     
+    def find_item(self, file_path, folder_id=None):
+        """Look up a single file or folder by path; returns the Drive entry or None"""
+        folder_path = '/'.join(file_path.split('/')[:-1])
+        file_name = file_path.split('/')[-1]
+        if folder_id is None:
+            folder_id = self.get_folder_id(folder_path or '/')
+        
+        query = f"name='{file_name}' and '{folder_id}' in parents and trashed=false"
+        results = self.execute(self.service.files().list(q=query, fields='files(id, name, mimeType)'))
+        items = results.get('files', [])
+        return items[0] if items else None
+    
+    def _list_children_batch(self, parent_ids):
+        """List the children of several folders with one paged query"""
+        parents_clause = ' or '.join(f"'{parent_id}' in parents" for parent_id in parent_ids)
+        query = f"({parents_clause}) and trashed=false"
+        
+        children = []
+        page_token = None
+        while True:
+            results = self.execute(self.service.files().list(
+                q=query,
+                spaces='drive',
+                fields='nextPageToken, files(id, name, mimeType, parents)',
+                pageSize=1000,
+                pageToken=page_token
+            ))
+            children.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return children
+    
+    def walk_tree(self, root_id, max_depth=None, progress=None):
+        """Breadth-first walk below root_id
+        
+        Each level is fetched with batched parent queries run concurrently.
+        Returns a dict mapping folder ID to its sorted child entries.
+        """
+        children_by_parent = {}
+        level = [root_id]
+        seen = {root_id}
+        depth = 0
+        scanned = 0
+        
+        with ThreadPoolExecutor(max_workers=self.walk_workers) as pool:
+            while level and (max_depth is None or depth < max_depth):
+                batches = [level[i:i + self.WALK_BATCH_SIZE] for i in range(0, len(level), self.WALK_BATCH_SIZE)]
+                level_ids = set(level)
+                next_level = []
+                
+                for children in pool.map(self._list_children_batch, batches):
+                    for child in children:
+                        # An item with parents in several batches comes back once per batch
+                        if child['id'] in seen:
+                            continue
+                        seen.add(child['id'])
+                        for parent_id in child.get('parents', []):
+                            if parent_id in level_ids:
+                                children_by_parent.setdefault(parent_id, []).append(child)
+                        if child['mimeType'] == FOLDER_MIME_TYPE:
+                            next_level.append(child['id'])
+                    scanned += len(children)
+                
+                depth += 1
+                level = next_level
+                if progress:
+                    progress(f"🔎 Scanned {scanned} items, {depth} level(s) deep...")
+        
+        sort_children(children_by_parent)
+        return children_by_parent
+    
+    def tree(self, folder_path, folder_id, max_depth=3, progress=None, max_chars=3500):
+        """Render a folder tree as a WhatsApp message"""
+        started = time.monotonic()
+        children_by_parent = self.walk_tree(folder_id, max_depth=max_depth, progress=progress)
+        return render_tree(folder_path, folder_id, children_by_parent, max_depth,
+                           time.monotonic() - started, max_chars)
+    
+    def copy_item(self, source_path, source_item, dest_folder_path, dest_folder_id, progress=None):
+        """Copy a file, or a folder recursively, into the destination folder"""
+        started = time.monotonic()
+        
+        if source_item['mimeType'] != FOLDER_MIME_TYPE:
+            try:
+                self.execute(self.service.files().copy(
+                    fileId=source_item['id'],
+                    body={'name': source_item['name'], 'parents': [dest_folder_id]},
+                    fields='id'
+                ), idempotent=False)
+                return f"✅ Successfully copied '{source_path}' to '{dest_folder_path}'"
+            except Exception as e:
+                return f"❌ Error copying file: {str(e)}"
+        
+        children_by_parent = self.walk_tree(source_item['id'], progress=progress)
+        root_copy_id = self._copy_folder(source_item, dest_folder_id)
+        if root_copy_id is None:
+            return f"❌ Error copying folder '{source_path}'"
+        new_ids = {source_item['id']: root_copy_id}
+        copied_folders, copied_files, failed = 1, 0, 0
+        
+        # Recreate the tree level by level: folders first so their children have a parent to land in
+        level = [source_item['id']]
+        with ThreadPoolExecutor(max_workers=self.walk_workers) as pool:
+            while level:
+                folder_jobs, file_jobs = [], []
+                for parent_id in level:
+                    for child in children_by_parent.get(parent_id, []):
+                        job = (child, new_ids[parent_id])
+                        (folder_jobs if child['mimeType'] == FOLDER_MIME_TYPE else file_jobs).append(job)
+                
+                new_folders = list(pool.map(lambda job: self._copy_folder(job[0], job[1]), folder_jobs))
+                for (child, _), new_id in zip(folder_jobs, new_folders):
+                    if new_id is None:
+                        # Nothing below a folder that could not be created gets copied
+                        failed += 1 + count_descendants(children_by_parent, child['id'])
+                    else:
+                        new_ids[child['id']] = new_id
+                        copied_folders += 1
+                
+                for ok in pool.map(lambda job: self._copy_file(job[0], job[1]), file_jobs):
+                    if ok:
+                        copied_files += 1
+                    else:
+                        failed += 1
+                
+                level = [child['id'] for child, _ in folder_jobs if child['id'] in new_ids]
+                if progress and level:
+                    progress(f"📦 Copied {copied_folders} folders and {copied_files} files so far...")
+        
+        return copy_report(source_path, dest_folder_path, copied_folders, copied_files, failed,
+                           time.monotonic() - started)
+    
+    def _create_folder(self, name, parent_id):
+        folder_metadata = {'name': name, 'mimeType': FOLDER_MIME_TYPE, 'parents': [parent_id]}
+        folder = self.execute(self.service.files().create(body=folder_metadata, fields='id'), idempotent=False)
+        return folder.get('id')
+    
+    def _copy_folder(self, item, parent_id):
+        try:
+            return self._create_folder(item['name'], parent_id)
+        except Exception as e:
+            print(f"Error creating folder {item['name']}: {e}")
+            return None
+    
+    def _copy_file(self, item, parent_id):
+        try:
+            self.execute(self.service.files().copy(
+                fileId=item['id'],
+                body={'name': item['name'], 'parents': [parent_id]},
+                fields='id'
+            ), idempotent=False)
+            return True
+        except Exception as e:
+            print(f"Error copying {item['name']}: {e}")
+            return False
+    
     def rename_file(self, current_name, new_name):
         """Rename a file"""
         query = f"name='{current_name}' and trashed=false"
-        results = self.service.files().list(q=query, fields='files(id)').execute()
+        results = self.execute(self.service.files().list(q=query, fields='files(id)'))
         items = results.get('files', [])
         
         if not items:
             return f"File '{current_name}' not found."
         
+        return self.rename_file_by_id(items[0]['id'], current_name, new_name)
+    
+    def rename_file_by_id(self, file_id, display_name, new_name):
+        """Rename a file or folder whose ID is already known"""
         try:
-            self.service.files().update(
-                fileId=items[0]['id'],
+            self.execute(self.service.files().update(
+                fileId=file_id,
                 body={'name': new_name}
-            ).execute()
-            return f"✅ Successfully renamed '{current_name}' to '{new_name}'"
+            ))
+            return f"✅ Successfully renamed '{display_name}' to '{new_name}'"
         except Exception as e:
             return f"❌ Error renaming file: {str(e)}"
     
@@ -150,11 +397,11 @@ class GoogleDriveClient:
         media = MediaFileUpload(file_content, mimetype=mime_type)
         
         try:
-            file = self.service.files().create(
+            file = self.execute(self.service.files().create(
                 body=file_metadata,
                 media_body=media,
                 fields='id'
-            ).execute()
+            ), idempotent=False)
             
             return f"✅ Successfully uploaded '{file_name}' to '{folder_path}'"
         except Exception as e:
@@ -162,8 +409,9 @@ class GoogleDriveClient:
     
     def download_file(self, file_id, file_name):
         """Download file content for processing"""
-        try:
+        def download(timeout):
             request = self.service.files().get_media(fileId=file_id)
+            request.http = self._thread_http(timeout)
             file_content = io.BytesIO()
             downloader = MediaIoBaseDownload(file_content, request)
             done = False
@@ -172,5 +420,87 @@ class GoogleDriveClient:
             
             file_content.seek(0)
             return file_content
+        
+        try:
+            return self.upstream.call(download, idempotent=True, is_transient=_is_transient_drive_error)
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             return None
+
+
+def _is_transient_drive_error(error):
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        return status == 429 or status >= 500 or is_rate_limit_error(status, error.content)
+    return isinstance(error, (OSError, httplib2.HttpLib2Error))
+
+
+def format_listing(folder_path, files):
+    """Format folder entries as a numbered WhatsApp message"""
+    if not files:
+        return "No files found in this folder."
+    
+    response = f"Files in '{folder_path}':\n"
+    for number, file in enumerate(files, start=1):
+        file_type = "📁" if file['mimeType'] == FOLDER_MIME_TYPE else "📄"
+        response += f"{number}. {file_type} {file['name']}\n"
+    
+    return response
+
+
+def sort_children(children_by_parent):
+    """Order walked children folders first, then by name"""
+    for children in children_by_parent.values():
+        children.sort(key=lambda f: (f['mimeType'] != FOLDER_MIME_TYPE, f['name'].lower()))
+
+
+def render_tree(folder_path, folder_id, children_by_parent, max_depth, elapsed, max_chars=3500):
+    """Render the result of a tree walk as an indented WhatsApp message"""
+    lines = []
+    folders = files = 0
+    stack = [(child, 0) for child in reversed(children_by_parent.get(folder_id, []))]
+    while stack:
+        item, indent = stack.pop()
+        is_folder = item['mimeType'] == FOLDER_MIME_TYPE
+        if is_folder:
+            folders += 1
+            stack.extend((child, indent + 1) for child in reversed(children_by_parent.get(item['id'], [])))
+        else:
+            files += 1
+        lines.append(f"{'  ' * indent}{'📁' if is_folder else '📄'} {item['name']}")
+    
+    if not lines:
+        return "No files found in this folder."
+    
+    response = f"🌳 Tree of '{folder_path}' (depth {max_depth}):\n"
+    body = '\n'.join(lines)
+    if len(body) > max_chars:
+        body = body[:max_chars].rsplit('\n', 1)[0] + '\n… (truncated)'
+    response += body + '\n\n'
+    response += f"{folders} folders, {files} files in {elapsed:.1f}s ({_rate(folders + files, elapsed)} items/s)"
+    return response
+
+
+def count_descendants(children_by_parent, folder_id):
+    """Number of entries below folder_id in a tree walk"""
+    count = 0
+    stack = [folder_id]
+    while stack:
+        children = children_by_parent.get(stack.pop(), [])
+        count += len(children)
+        stack.extend(child['id'] for child in children if child['mimeType'] == FOLDER_MIME_TYPE)
+    return count
+
+
+def copy_report(source_path, dest_folder_path, copied_folders, copied_files, failed, elapsed):
+    response = (f"✅ Copied {copied_folders} folders and {copied_files} files from '{source_path}' "
+                f"to '{dest_folder_path}' in {elapsed:.1f}s "
+                f"({_rate(copied_folders + copied_files, elapsed)} items/s)")
+    if failed:
+        response += f"\n⚠️ {failed} items could not be copied."
+    return response
+
+
+def _rate(count, seconds):
+    return f"{count / seconds:.1f}" if seconds > 0 else str(count)
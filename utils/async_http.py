@@ -0,0 +1,45 @@
+import asyncio
+import httpx
+from utils.resilience import is_rate_limit_error
+
+
+def create_http_client(max_connections=100, max_keepalive_connections=20, pool_timeout=30):
+    """One pooled AsyncClient shared by the Drive, OpenAI and WhatsApp async clients"""
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+    return httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(30, pool=pool_timeout))
+
+
+async def gather_or_cancel(*coroutines):
+    """Like asyncio.gather, but the first failure cancels the other tasks before it is raised"""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def attempt_timeout(http, seconds):
+    """Per-attempt timeout for the upstream, keeping the client's own budget for the pool wait"""
+    return httpx.Timeout(seconds, pool=http.timeout.pool)
+
+
+def is_pool_timeout(error):
+    """No pooled connection became free in time: local congestion, not an upstream failure"""
+    return isinstance(error, httpx.PoolTimeout)
+
+
+def is_transient_http_error(error):
+    if is_pool_timeout(error):
+        return False
+    if isinstance(error, httpx.HTTPStatusError):
+        response = error.response
+        if response.status_code == 429 or response.status_code >= 500:
+            return True
+        try:
+            return is_rate_limit_error(response.status_code, response.content)
+        except httpx.ResponseNotRead:
+            return False
+    return isinstance(error, httpx.TransportError)
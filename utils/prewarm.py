@@ -0,0 +1,401 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+
+class HotFolderTracker:
+    """Decaying request counts per (command, folder) learned from command history
+
+    With a `state_file` the counts survive restarts: they are loaded on
+    start-up and written back by save().
+    """
+
+    def __init__(self, half_life_seconds=3 * 24 * 3600, max_entries=500, state_file=None):
+        self.half_life_seconds = half_life_seconds
+        self.max_entries = max_entries
+        self.state_file = state_file
+        self._entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if state_file:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_file) as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Could not load hot folders from {self.state_file}: {e}")
+            return
+        self._entries = {(e['command'], e['folder_id']): e for e in entries}
+
+    def save(self):
+        """Write the counts to `state_file` if they changed since the last save"""
+        if not self.state_file:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [dict(e) for e in self._entries.values()]
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            tmp_file = self.state_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            print(f"Could not save hot folders to {self.state_file}: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def _decayed(self, score, updated_at, now):
+        return score * 0.5 ** ((now - updated_at) / self.half_life_seconds)
+
+    def record(self, command, folder_path, folder_id):
+        now = time.time()
+        key = (command, folder_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            score = self._decayed(entry['score'], entry['updated_at'], now) + 1 if entry else 1
+            self._entries[key] = {'command': command, 'folder_path': folder_path, 'folder_id': folder_id,
+                                  'score': score, 'updated_at': now}
+            self._dirty = True
+
+            if len(self._entries) > self.max_entries:
+                coldest = min(self._entries, key=lambda k: self._decayed(
+                    self._entries[k]['score'], self._entries[k]['updated_at'], now))
+                del self._entries[coldest]
+
+    def top(self, limit):
+        now = time.time()
+        with self._lock:
+            ranked = sorted(self._entries.values(),
+                            key=lambda e: self._decayed(e['score'], e['updated_at'], now), reverse=True)
+            return [dict(e) for e in ranked[:limit]]
+
+
+class WarmCache:
+    """Listing and summary results keyed by (command, folder_id)
+
+    Every entry remembers the IDs of the items it was built from. A Drive
+    change drops only the entries of the changed item, of its parents and
+    of the folders it was listed in (which covers items moved or deleted
+    out of a folder), so edits elsewhere in the Drive leave them warm.
+
+    Entries are only trusted for `max_age_seconds` while something keeps
+    confirming that Drive changes are being tracked (see mark_tracked());
+    otherwise edits made outside this bot would go unnoticed, so entries
+    expire after `untracked_max_age_seconds`.
+
+    Writers read `generation(folder_id)` before fetching and hand it to
+    put(), which drops the result if the folder was invalidated in between:
+    data fetched before a change must not land in the cache after it.
+    """
+
+    MAX_TRACKED_FOLDERS = 10000
+
+    def __init__(self, max_age_seconds=12 * 3600, untracked_max_age_seconds=60):
+        self.max_age_seconds = max_age_seconds
+        self.untracked_max_age_seconds = untracked_max_age_seconds
+        self._tracked_until = 0
+        self._entries = {}
+        self._members = {}
+        self._generation = 0
+        self._folder_generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, command, folder_id):
+        """Return (value, stored_at) if a fresh entry exists, else None"""
+        now = time.time()
+        with self._lock:
+            max_age = self.max_age_seconds if now < self._tracked_until else self.untracked_max_age_seconds
+            entry = self._entries.get((command, folder_id))
+            if entry is None or now - entry[1] > max_age:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+
+    def mark_tracked(self, seconds):
+        """Drive changes up to now have been applied; keep trusting entries for another `seconds`"""
+        with self._lock:
+            self._tracked_until = time.time() + seconds
+
+    def is_tracked(self):
+        return time.time() < self._tracked_until
+
+    def generation(self, folder_id):
+        with self._lock:
+            return self._generation, self._folder_generations.get(folder_id, 0)
+
+    def put(self, command, folder_id, value, generation, members):
+        """Store a result built from the item IDs `members` at `generation`
+
+        Returns False, storing nothing, if the folder was invalidated meanwhile.
+        """
+        with self._lock:
+            if generation != (self._generation, self._folder_generations.get(folder_id, 0)):
+                return False
+            self._entries[(command, folder_id)] = (value, time.time())
+            self._members[(command, folder_id)] = set(members)
+            return True
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._members.clear()
+            self._folder_generations.clear()
+
+    def invalidate_items(self, item_ids, parent_ids=()):
+        """Drop entries affected by changes to `item_ids` (whose current parents are `parent_ids`)
+
+        Returns the (command, folder_id) keys that were dropped.
+        """
+        item_ids = set(item_ids)
+        with self._lock:
+            folder_ids = item_ids | set(parent_ids)
+            folder_ids.update(folder_id for (_, folder_id), members in self._members.items()
+                              if members & item_ids)
+            dropped = [key for key in self._entries if key[1] in folder_ids]
+            for key in dropped:
+                del self._entries[key]
+                del self._members[key]
+
+            if len(self._folder_generations) + len(folder_ids) > self.MAX_TRACKED_FOLDERS:
+                # Forget per-folder counters; bumping the global one still rejects in-flight writes
+                self._folder_generations.clear()
+                self._generation += 1
+            else:
+                for folder_id in folder_ids:
+                    self._folder_generations[folder_id] = self._folder_generations.get(folder_id, 0) + 1
+            return dropped
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Prewarmer:
+    """Background thread that refreshes the hottest folders while live traffic is idle
+
+    Every `poll_seconds` it also reads the Drive change log from a saved
+    page token, so edits made in the Drive UI or by other apps invalidate
+    the cache like this bot's own, and each successful poll lets the cache
+    keep trusting its entries (WarmCache.mark_tracked).
+
+    A refresh cycle runs once per day inside the off-peak hours. After Drive
+    changes, the results that were dropped are refreshed once changes have
+    been quiet for `change_debounce_seconds`, or at the latest
+    `max_change_delay_seconds` after the first of them. Work only happens while `is_busy()`
+    is false, each cycle is capped at `max_seconds_per_cycle`, and summaries
+    stop once `token_budget_per_hour` OpenAI tokens have been spent in the
+    current hour. Summaries re-check all three before every file, and only
+    the tokens they spend themselves count against the budget.
+    """
+
+    def __init__(self, drive_client, summarizer, tracker, cache, is_busy,
+                 top_n=20, offpeak_hours=(5, 7), change_debounce_seconds=30, max_change_delay_seconds=300,
+                 max_seconds_per_cycle=300, token_budget_per_hour=20000, poll_seconds=30):
+        self.drive_client = drive_client
+        self.summarizer = summarizer
+        self.tracker = tracker
+        self.cache = cache
+        self.is_busy = is_busy
+        self.top_n = top_n
+        self.offpeak_hours = offpeak_hours
+        self.change_debounce_seconds = change_debounce_seconds
+        self.max_change_delay_seconds = max_change_delay_seconds
+        self.max_seconds_per_cycle = max_seconds_per_cycle
+        self.token_budget_per_hour = token_budget_per_hour
+        self.poll_seconds = poll_seconds
+
+        self._wake = threading.Event()
+        self._stopped = False
+        self._changes_lock = threading.Lock()
+        self._changed_at = None
+        self._first_change_at = None
+        self._pending = set()
+        self._refresh_all = False
+        self._page_token = None
+        self._polled_at = None
+        self._last_offpeak_date = None
+        self._budget_hour = None
+        self._tokens_this_hour = 0
+        self.cycles = 0
+        self.refreshed = 0
+        self.last_cycle_at = None
+
+        self._thread = threading.Thread(target=self._run, name='prewarmer', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        self.tracker.save()
+
+    def notify_change(self, item_ids=None, parent_ids=()):
+        """Drop the cached results a Drive change affects and schedule their refresh
+
+        Without `item_ids` every result is dropped.
+        """
+        if item_ids is None:
+            self.cache.invalidate()
+            dropped = None
+        else:
+            dropped = self.cache.invalidate_items(item_ids, parent_ids)
+            if not dropped:
+                return
+
+        now = time.monotonic()
+        with self._changes_lock:
+            if dropped is None:
+                self._refresh_all = True
+            else:
+                self._pending.update(dropped)
+            if self._first_change_at is None:
+                self._first_change_at = now
+            self._changed_at = now
+        self._wake.set()
+
+    def poll_now(self):
+        """Read the Drive change log on the next wake-up, e.g. after a push notification"""
+        self._polled_at = None
+        self._wake.set()
+
+    def stats(self):
+        return {
+            'hot_folders': len(self.tracker.top(self.top_n)),
+            'cached_results': len(self.cache),
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+            'change_tracking': self.cache.is_tracked(),
+            'cycles': self.cycles,
+            'refreshed': self.refreshed,
+            'tokens_this_hour': self._tokens_this_hour,
+            'last_cycle_at': self.last_cycle_at,
+        }
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            if self._stopped:
+                return
+
+            self.tracker.save()
+            self._poll_changes()
+            due, only = self._take_pending()
+            if due:
+                self._run_cycle(only)
+                continue
+
+            now = datetime.now()
+            start_hour, end_hour = self.offpeak_hours
+            if start_hour <= now.hour < end_hour and self._last_offpeak_date != now.date():
+                self._last_offpeak_date = now.date()
+                self._run_cycle()
+
+    def _take_pending(self):
+        """Return (due, only): whether a change refresh is due, and the keys to refresh (None for all)"""
+        now = time.monotonic()
+        with self._changes_lock:
+            if self._changed_at is None:
+                return False, None
+            if (now - self._changed_at < self.change_debounce_seconds
+                    and now - self._first_change_at < self.max_change_delay_seconds):
+                return False, None
+            only = None if self._refresh_all else self._pending
+            self._changed_at = self._first_change_at = None
+            self._pending = set()
+            self._refresh_all = False
+            return True, only
+
+    def _run_cycle(self, only=None):
+        """Refresh the top folders, or only those whose (command, folder_id) is in `only`"""
+        deadline = time.monotonic() + self.max_seconds_per_cycle
+        self.cycles += 1
+        self.last_cycle_at = datetime.now().isoformat(timespec='seconds')
+
+        for entry in self.tracker.top(self.top_n):
+            folder_id = entry['folder_id']
+            if only is not None and (entry['command'], folder_id) not in only:
+                continue
+            if not self._wait_until_idle(deadline):
+                return
+            generation = self.cache.generation(folder_id)
+            try:
+                if entry['command'] == 'LIST':
+                    files = self.drive_client.list_folder(folder_id)
+                    self.cache.put('LIST', folder_id, files, generation, [f['id'] for f in files])
+                elif entry['command'] == 'SUMMARY':
+                    if not self._within_token_budget():
+                        continue
+                    cached = self.cache.get('LIST', folder_id)
+                    files = cached[0] if cached else self.drive_client.list_folder(folder_id)
+                    usage = {'tokens': 0}
+                    try:
+                        summary = self.summarizer.summarize_folder(
+                            self.drive_client, entry['folder_path'], folder_id=folder_id, files=files,
+                            should_continue=lambda: self._may_continue(deadline, usage), usage=usage)
+                    finally:
+                        self._tokens_this_hour += usage['tokens']
+                    if summary is None:
+                        continue
+                    self.cache.put('SUMMARY', folder_id, summary, generation, [f['id'] for f in files])
+                self.refreshed += 1
+            except Exception as e:
+                print(f"Prewarm of {entry['command']} {entry['folder_path']} failed: {e}")
+
+    def _poll_changes(self):
+        """Read the Drive change log since the last poll and drop the cached results it affects"""
+        if self._polled_at is not None and time.monotonic() - self._polled_at < self.poll_seconds / 2:
+            return
+        self._polled_at = time.monotonic()
+        try:
+            if self._page_token is None:
+                self._page_token = self.drive_client.get_changes_start_token()
+                # Entries cached before the token may predate changes it does not cover
+                self.cache.invalidate()
+            else:
+                changes, self._page_token = self.drive_client.list_changes(self._page_token)
+                if changes:
+                    self.notify_change([change['fileId'] for change in changes],
+                                       [parent_id for change in changes
+                                        for parent_id in (change.get('file') or {}).get('parents', [])])
+        except Exception as e:
+            # Start over from a fresh token; until then the cache falls back to its short untracked lifetime
+            print(f"Polling Drive changes failed: {e}")
+            self._page_token = None
+            return
+        self.cache.mark_tracked(2 * self.poll_seconds + 10)
+
+    def _wait_until_idle(self, deadline):
+        self._poll_changes()
+        while self.is_busy():
+            if self._stopped or time.monotonic() >= deadline:
+                return False
+            time.sleep(1)
+            self._poll_changes()
+        return not self._stopped and time.monotonic() < deadline
+
+    def _may_continue(self, deadline, usage):
+        """Whether a summary in progress may go on to its next file"""
+        if not self._wait_until_idle(deadline):
+            return False
+        return self._tokens_this_hour + usage['tokens'] < self.token_budget_per_hour
+
+    def _within_token_budget(self):
+        hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+        if hour != self._budget_hour:
+            self._budget_hour = hour
+            self._tokens_this_hour = 0
+        return self._tokens_this_hour < self.token_budget_per_hour
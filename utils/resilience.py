@@ -0,0 +1,239 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import deque
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when an upstream is failing and the call was not (or could not be) completed"""
+
+    def __init__(self, upstream_name):
+        super().__init__(f"{upstream_name} is temporarily unavailable. Please try again later.")
+        self.upstream_name = upstream_name
+
+
+class ServiceBusy(Exception):
+    """Raised when a call never reached the upstream because a local resource, such as the connection pool, ran out"""
+
+    def __init__(self):
+        super().__init__("The assistant is busy right now. Please try again in a moment.")
+
+
+class LatencyTracker:
+    """Rolling window of call latencies used to derive an adaptive timeout"""
+
+    def __init__(self, window=200, min_samples=20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, pct):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def has_enough_samples(self):
+        return len(self.samples) >= self.min_samples
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open trial after a cool-down"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def allow(self):
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def release_trial(self):
+        """Give up a half-open trial that ended without an answer, e.g. because the caller was cancelled"""
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class Upstream:
+    """Timeouts, retries and a circuit breaker for one external service
+
+    The timeout starts at `default_timeout` and, once enough calls have been
+    observed, follows `timeout_multiplier` x the p99 latency clamped to
+    [min_timeout, max_timeout]. Transient failures (as judged by
+    `is_transient`) are retried with full-jitter exponential backoff, but
+    only for idempotent calls, and count towards tripping the breaker.
+    Failures judged local (`is_local`, e.g. waiting too long for a pooled
+    connection) say nothing about the upstream: they are neither retried
+    nor counted, and surface as ServiceBusy.
+    """
+
+    def __init__(self, name, display_name, default_timeout=30, min_timeout=2, max_timeout=60,
+                 timeout_multiplier=3, max_retries=2, backoff_base=0.5, backoff_cap=8,
+                 failure_threshold=5, reset_timeout=30, is_transient=None):
+        self.name = name
+        self.display_name = display_name
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.is_transient = is_transient or (lambda e: isinstance(e, (OSError, TimeoutError)))
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._lock = threading.Lock()
+
+    def current_timeout(self):
+        with self._lock:
+            if not self.latency.has_enough_samples():
+                return self.default_timeout
+            p99 = self.latency.percentile(99)
+        return max(self.min_timeout, min(self.max_timeout, p99 * self.timeout_multiplier))
+
+    def call(self, fn, idempotent=False, is_transient=None, is_local=None):
+        """Call `fn(timeout)` under the breaker, retrying transient failures if idempotent"""
+        attempts = 1 + (self.max_retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            self._before_attempt()
+            started = time.monotonic()
+            try:
+                result = fn(self.current_timeout())
+            except Exception as e:
+                time.sleep(self._after_failure(e, attempt, attempts, is_transient, is_local))
+                continue
+            except BaseException:
+                self._abandon_attempt()
+                raise
+
+            self._after_success(started)
+            return result
+
+    async def acall(self, fn, idempotent=False, is_transient=None, is_local=None):
+        """Async variant of call(): awaits `fn(timeout)` and backs off without blocking the loop"""
+        attempts = 1 + (self.max_retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            self._before_attempt()
+            started = time.monotonic()
+            try:
+                result = await fn(self.current_timeout())
+            except Exception as e:
+                await asyncio.sleep(self._after_failure(e, attempt, attempts, is_transient, is_local))
+                continue
+            except BaseException:
+                # CancelledError and friends say nothing about the upstream's health
+                self._abandon_attempt()
+                raise
+
+            self._after_success(started)
+            return result
+
+    def _before_attempt(self):
+        with self._lock:
+            allowed = self.breaker.allow()
+        if not allowed:
+            raise UpstreamUnavailable(self.display_name)
+
+    def _after_success(self, started):
+        with self._lock:
+            self.latency.record(time.monotonic() - started)
+            self.breaker.record_success()
+
+    def _abandon_attempt(self):
+        with self._lock:
+            self.breaker.release_trial()
+
+    def _after_failure(self, error, attempt, attempts, is_transient, is_local=None):
+        """Record a failed attempt; re-raise it or return the backoff before the next one"""
+        if is_local and is_local(error):
+            self._abandon_attempt()
+            raise ServiceBusy() from error
+        if not (is_transient or self.is_transient)(error):
+            # The upstream answered; the request itself was bad
+            with self._lock:
+                self.breaker.record_success()
+            raise error
+        with self._lock:
+            self.breaker.record_failure()
+        if attempt == attempts - 1:
+            raise UpstreamUnavailable(self.display_name) from error
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def health(self):
+        timeout = self.current_timeout()
+        with self._lock:
+            p50 = self.latency.percentile(50)
+            p99 = self.latency.percentile(99)
+            return {
+                'state': self.breaker.state,
+                'consecutive_failures': self.breaker.consecutive_failures,
+                'timeout_seconds': round(timeout, 2),
+                'latency_p50_seconds': round(p50, 3) if p50 is not None else None,
+                'latency_p99_seconds': round(p99, 3) if p99 is not None else None,
+            }
+
+
+# Google APIs report quota exhaustion as 403 with one of these reasons instead of 429
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'RATE_LIMIT_EXCEEDED'}
+
+_upstreams = {}
+_upstreams_lock = threading.Lock()
+
+
+def get_upstream(name, display_name=None, **kwargs):
+    """Return the shared Upstream for `name`, creating it with `kwargs` on first use"""
+    with _upstreams_lock:
+        upstream = _upstreams.get(name)
+        if upstream is None:
+            upstream = _upstreams[name] = Upstream(name, display_name or name, **kwargs)
+        return upstream
+
+
+def is_rate_limit_error(status, content):
+    """True for a Google API 403 whose error body names a rate-limit reason"""
+    if status != 403:
+        return False
+    try:
+        error = json.loads(content)['error']
+        reasons = [e.get('reason') for e in error.get('errors', []) + error.get('details', [])]
+    except (TypeError, ValueError, KeyError, AttributeError):
+        return False
+    return any(reason in RATE_LIMIT_REASONS for reason in reasons)
+
+
+def upstream_health():
+    with _upstreams_lock:
+        upstreams = list(_upstreams.values())
+    return {upstream.name: upstream.health() for upstream in upstreams}
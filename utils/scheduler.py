@@ -0,0 +1,298 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` tokens, refilled at `refill_rate` per second"""
+
+    def __init__(self, capacity, refill_rate):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def try_consume(self, amount):
+        """Take `amount` tokens; return 0 on success or the seconds until it would succeed"""
+        self._refill(time.monotonic())
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0
+        if self.refill_rate <= 0:
+            return float('inf')
+        return (amount - self.tokens) / self.refill_rate
+
+    def is_full(self):
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class _Job:
+    __slots__ = ('user_id', 'command', 'cost', 'expensive', 'finish_tag', 'fn', 'enqueued_at')
+
+    def __init__(self, user_id, command, cost, expensive, finish_tag, fn):
+        self.user_id = user_id
+        self.command = command
+        self.cost = cost
+        self.expensive = expensive
+        self.finish_tag = finish_tag
+        self.fn = fn
+        self.enqueued_at = time.monotonic()
+
+
+class _FairQueue:
+    """Admission and dispatch policy shared by the thread and asyncio schedulers
+
+    Every command has a cost. Users get a token bucket charged with that cost,
+    a limit on in-flight commands, and a bounded FIFO queue. Across users,
+    jobs are dispatched by weighted fair queuing on virtual finish tags, so
+    a user with a backlog of SUMMARY commands cannot starve other users'
+    LIST commands. Expensive commands are additionally capped globally
+    so at least one worker is always left for cheap ones.
+
+    Subclasses provide the workers and the locking around these methods.
+    """
+
+    COMMAND_COSTS = {
+        'HELP': 1,
+        'PWD': 1,
+        'UNKNOWN': 1,
+        'LIST': 1,
+        'CD': 1,
+        'DELETE': 2,
+        'MOVE': 2,
+        'RENAME': 2,
+        'UPLOAD_TEXT': 2,
+        'TREE': 5,
+        'COPY': 10,
+        'SUMMARY': 10,
+    }
+    EXPENSIVE_COMMANDS = {'TREE', 'COPY', 'SUMMARY'}
+    DEFAULT_COST = 2
+
+    def __init__(self, workers=4, max_user_inflight=1, max_user_queued=10,
+                 max_expensive=None, bucket_capacity=30, refill_per_second=0.5):
+        self.workers = workers
+        self.max_user_inflight = max_user_inflight
+        self.max_user_queued = max_user_queued
+        self.max_expensive = max_expensive if max_expensive is not None else max(1, workers - 1)
+        self.bucket_capacity = bucket_capacity
+        self.refill_per_second = refill_per_second
+
+        self._queues = {}
+        self._inflight = {}
+        self._last_finish = {}
+        self._buckets = {}
+        self._virtual_time = 0.0
+        self._expensive_running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._stopped = False
+
+    def cost_of(self, command):
+        return self.COMMAND_COSTS.get(command, self.DEFAULT_COST)
+
+    def is_expensive(self, command):
+        return command in self.EXPENSIVE_COMMANDS
+
+    def _enqueue(self, user_id, command, fn):
+        """Admit a job; return None if queued or a message explaining the rejection"""
+        cost = self.cost_of(command)
+
+        queue = self._queues.get(user_id)
+        if queue is not None and len(queue) >= self.max_user_queued:
+            self._rejected += 1
+            return " You have too many commands waiting. Please wait for them to finish."
+
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            self._prune_buckets()
+            bucket = self._buckets[user_id] = TokenBucket(self.bucket_capacity, self.refill_per_second)
+        wait = bucket.try_consume(cost)
+        if wait:
+            self._rejected += 1
+            return f" You're sending commands too quickly. Please try again in {int(wait) + 1} seconds."
+
+        start_tag = max(self._virtual_time, self._last_finish.get(user_id, 0.0))
+        finish_tag = start_tag + cost
+        self._last_finish[user_id] = finish_tag
+
+        job = _Job(user_id, command, cost, self.is_expensive(command), finish_tag, fn)
+        self._queues.setdefault(user_id, deque()).append(job)
+        return None
+
+    def _next_job(self):
+        """Pick the eligible head-of-queue job with the smallest finish tag"""
+        best = None
+        for user_id, queue in self._queues.items():
+            job = queue[0]
+            if self._inflight.get(user_id, 0) >= self.max_user_inflight:
+                continue
+            if job.expensive and self._expensive_running >= self.max_expensive:
+                continue
+            if best is None or job.finish_tag < best.finish_tag:
+                best = job
+
+        if best is not None:
+            queue = self._queues[best.user_id]
+            queue.popleft()
+            if not queue:
+                del self._queues[best.user_id]
+        return best
+
+    def _begin(self, job):
+        self._virtual_time = max(self._virtual_time, job.finish_tag - job.cost)
+        self._inflight[job.user_id] = self._inflight.get(job.user_id, 0) + 1
+        if job.expensive:
+            self._expensive_running += 1
+
+    def _end(self, job):
+        self._inflight[job.user_id] -= 1
+        if not self._inflight[job.user_id]:
+            del self._inflight[job.user_id]
+        if job.expensive:
+            self._expensive_running -= 1
+        self._completed += 1
+
+    def _stats(self):
+        return {
+            'workers': self.workers,
+            'queued': sum(len(q) for q in self._queues.values()),
+            'inflight': sum(self._inflight.values()),
+            'expensive_running': self._expensive_running,
+            'completed': self._completed,
+            'rejected': self._rejected,
+        }
+
+    def _prune_buckets(self):
+        # Idle users with a full bucket carry no state worth keeping
+        if len(self._buckets) < 1000:
+            return
+        for user_id in [u for u, b in self._buckets.items()
+                        if b.is_full() and u not in self._queues and u not in self._inflight]:
+            del self._buckets[user_id]
+            self._last_finish.pop(user_id, None)
+
+
+class CommandScheduler(_FairQueue):
+    """Runs user commands on a pool of worker threads with per-user fairness"""
+
+    def __init__(self, workers=4, **kwargs):
+        super().__init__(workers=workers, **kwargs)
+        self._cond = threading.Condition()
+
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"command-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, user_id, command, fn):
+        """Queue `fn` for `user_id`; return None if accepted or a message explaining the rejection"""
+        with self._cond:
+            rejection = self._enqueue(user_id, command, fn)
+            if rejection is None:
+                self._cond.notify()
+        return rejection
+
+    def stats(self):
+        with self._cond:
+            return self._stats()
+
+    def is_busy(self):
+        with self._cond:
+            return bool(self._queues or self._inflight)
+
+    def shutdown(self, wait=True):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopped:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    return
+                self._begin(job)
+
+            try:
+                job.fn()
+            except Exception as e:
+                print(f"Error running {job.command} for {job.user_id}: {e}")
+            finally:
+                with self._cond:
+                    self._end(job)
+                    self._cond.notify_all()
+
+
+class AsyncCommandScheduler(_FairQueue):
+    """Same policy as CommandScheduler, with asyncio tasks awaiting coroutine jobs
+
+    Workers only wait on network I/O, so `workers` can be in the hundreds.
+    All methods must be called from the event loop that ran start().
+    """
+
+    def __init__(self, workers=256, **kwargs):
+        super().__init__(workers=workers, **kwargs)
+        self._cond = None
+        self._tasks = []
+
+    def start(self):
+        self._cond = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, user_id, command, fn):
+        """Queue coroutine function `fn` for `user_id`; return None or a rejection message"""
+        async with self._cond:
+            rejection = self._enqueue(user_id, command, fn)
+            if rejection is None:
+                self._cond.notify()
+        return rejection
+
+    def stats(self):
+        return self._stats()
+
+    def is_busy(self):
+        return bool(self._queues or self._inflight)
+
+    async def shutdown(self):
+        async with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _worker(self):
+        while True:
+            async with self._cond:
+                job = None
+                while not self._stopped:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    await self._cond.wait()
+                if job is None:
+                    return
+                self._begin(job)
+
+            try:
+                await job.fn()
+            except Exception as e:
+                print(f"Error running {job.command} for {job.user_id}: {e}")
+            finally:
+                async with self._cond:
+                    self._end(job)
+                    self._cond.notify_all()
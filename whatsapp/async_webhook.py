@@ -0,0 +1,29 @@
+from utils.async_http import attempt_timeout, is_pool_timeout, is_transient_http_error
+from .webhook import WhatsAppWebhook
+
+
+class AsyncWhatsAppWebhook(WhatsAppWebhook):
+    """WhatsAppWebhook whose send_message is a coroutine using a shared httpx.AsyncClient"""
+
+    def __init__(self, http):
+        super().__init__()
+        self.http = http
+
+    async def _apost(self, headers, payload, timeout):
+        response = await self.http.post(self.api_url, headers=headers, json=payload,
+                                        timeout=attempt_timeout(self.http, timeout))
+        response.raise_for_status()
+        return response
+
+    async def send_message(self, to, message):
+        """Send message via WhatsApp Business API"""
+        headers, payload = self._build_message(to, message)
+
+        try:
+            # Not retried: a timed-out send may still have been delivered
+            await self.upstream.acall(lambda timeout: self._apost(headers, payload, timeout),
+                                      is_transient=is_transient_http_error, is_local=is_pool_timeout)
+            return True
+        except Exception as e:
+            print(f"Error sending message: {e}")
+            return False
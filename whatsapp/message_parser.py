@@ -6,11 +6,20 @@ class WhatsAppMessageParser:
         """Parse WhatsApp message and extract command and parameters"""
         message = message.strip()
         
-        # LIST command
-        list_match = re.match(r'^LIST\s+(.+)$', message, re.IGNORECASE)
+        # LIST command (no path lists the current folder)
+        list_match = re.match(r'^LIST(?:\s+(.+))?$', message, re.IGNORECASE)
         if list_match:
             return {'command': 'LIST', 'folder_path': list_match.group(1)}
         
+        # CD command
+        cd_match = re.match(r'^CD(?:\s+(.+))?$', message, re.IGNORECASE)
+        if cd_match:
+            return {'command': 'CD', 'folder_path': cd_match.group(1) or '/'}
+        
+        # PWD command
+        if message.upper() == 'PWD':
+            return {'command': 'PWD'}
+        
         # DELETE command
         delete_match = re.match(r'^DELETE\s+(.+)$', message, re.IGNORECASE)
         if delete_match:
@@ -25,8 +34,26 @@ class WhatsAppMessageParser:
                 'dest_path': move_match.group(2)
             }
         
-        # SUMMARY command
-        summary_match = re.match(r'^SUMMARY\s+(.+)$', message, re.IGNORECASE)
+        # COPY command (folders are copied recursively)
+        copy_match = re.match(r'^COPY\s+([^\s]+)\s+([^\s]+)$', message, re.IGNORECASE)
+        if copy_match:
+            return {
+                'command': 'COPY',
+                'source_path': copy_match.group(1),
+                'dest_path': copy_match.group(2)
+            }
+        
+        # TREE command with optional depth
+        tree_match = re.match(r'^TREE(?:\s+(.+?))?(?:\s+(\d+))?$', message, re.IGNORECASE)
+        if tree_match:
+            return {
+                'command': 'TREE',
+                'folder_path': tree_match.group(1),
+                'depth': int(tree_match.group(2)) if tree_match.group(2) else None
+            }
+        
+        # SUMMARY command (no path summarizes the current folder)
+        summary_match = re.match(r'^SUMMARY(?:\s+(.+))?$', message, re.IGNORECASE)
         if summary_match:
             return {'command': 'SUMMARY', 'folder_path': summary_match.group(1)}
         
@@ -64,19 +91,38 @@ Here are the available commands:
 *📁 LIST Commands:*
 • `LIST /FolderName` - List files in a folder
 • `LIST /` - List files in root directory
+• `LIST` - List files in the current folder
+
+*🌳 TREE Commands:*
+• `TREE /FolderName` - Show the folder tree (3 levels deep)
+• `TREE /FolderName 5` - Show the folder tree up to 5 levels deep
+• `TREE . 2` - Current folder, 2 levels deep (a lone number like `TREE 5` is read as a folder name)
+
+*📂 Navigation:*
+• `CD /FolderName` - Change the current folder
+• `CD SubFolder` / `CD ..` - Paths without a leading `/` are relative
+• `PWD` - Show the current folder
 
 *🗑️ DELETE Commands:*
 • `DELETE /FolderName/file.pdf` - Delete a file
 • `DELETE /FolderName` - Delete a folder
+• `DELETE #3` - Delete item 3 from your last listing
 
 *📦 MOVE Commands:*
 • `MOVE /FolderName/file.pdf /Archive` - Move file to another folder
+• `MOVE #2 Archive` - Move item 2 from your last listing
+
+*📑 COPY Commands:*
+• `COPY /FolderName/file.pdf /Backup` - Copy a file
+• `COPY /Project /Archive` - Copy a folder and everything in it
 
 *📊 SUMMARY Commands:*
 • `SUMMARY /FolderName` - AI summary of all files in folder
+• `SUMMARY` - AI summary of the current folder
 
 *✏️ RENAME Commands:*
-• `RENAME file.pdf new_file.pdf` - Rename a file
+• `RENAME file.pdf new_file.pdf` - Rename a file in the current folder
+• `RENAME #2 new_file.pdf` - Rename item 2 from your last listing
 
 *⬆️ UPLOAD Commands:*
 • Send a file with caption: `UPLOAD /FolderName new_filename.pdf`
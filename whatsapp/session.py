@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserSession:
+    """Conversation state for a single WhatsApp user"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.cwd = '/'
+        self.cwd_id = 'root'
+        self.last_listing_path = None
+        self.last_listing_id = None
+        self.last_results = []
+        self.touched_at = time.monotonic()
+
+    def resolve_path(self, path):
+        """Turn a path relative to the working folder into an absolute path"""
+        if not path or path == '.':
+            return self.cwd
+
+        parts = [] if path.startswith('/') else self.cwd.strip('/').split('/')
+        for part in path.split('/'):
+            if not part or part == '.':
+                continue
+            if part == '..':
+                if parts:
+                    parts.pop()
+                continue
+            parts.append(part)
+
+        return '/' + '/'.join(p for p in parts if p)
+
+    def known_folder_id(self, absolute_path):
+        """Return the folder ID for a path this session already resolved, if any"""
+        if absolute_path == '/':
+            return 'root'
+        if absolute_path == self.cwd:
+            return self.cwd_id
+        if absolute_path == self.last_listing_path:
+            return self.last_listing_id
+        for item in self.last_results:
+            if item.get('path') == absolute_path and item['mimeType'] == 'application/vnd.google-apps.folder':
+                return item['id']
+        return None
+
+    def change_directory(self, absolute_path, folder_id):
+        self.cwd = absolute_path
+        self.cwd_id = folder_id
+
+    def remember_listing(self, absolute_path, folder_id, files):
+        """Store the last listing so follow-up commands can use `#n` references"""
+        base = absolute_path.rstrip('/')
+        self.last_listing_path = absolute_path
+        self.last_listing_id = folder_id
+        self.last_results = [dict(f, path=f"{base}/{f['name']}") for f in files]
+
+    def result_at(self, reference):
+        """Look up a `#n` reference from the last listing"""
+        try:
+            index = int(reference.lstrip('#'))
+        except ValueError:
+            return None
+        if 1 <= index <= len(self.last_results):
+            return self.last_results[index - 1]
+        return None
+
+
+class SessionStore:
+    """Bounded, TTL-evicted store of UserSession objects keyed by WhatsApp number"""
+
+    def __init__(self, max_sessions=1000, ttl_seconds=1800):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return the user's session, creating a fresh one if missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+
+            session = self._sessions.pop(user_id, None)
+            if session is None:
+                session = UserSession(user_id)
+            session.touched_at = now
+            self._sessions[user_id] = session
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+            return session
+
+    def clear(self, user_id):
+        with self._lock:
+            self._sessions.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict_expired(self, now):
+        # Sessions are kept in least-recently-used order, so expired ones are at the front
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if now - session.touched_at < self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
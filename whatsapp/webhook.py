@@ -1,15 +1,30 @@
 import requests
 import json
 from config import Config
+from utils.resilience import get_upstream
+
+
+def _is_transient_graph_error(error):
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, (requests.Timeout, requests.ConnectionError))
+
 
 class WhatsAppWebhook:
     def __init__(self):
         self.token = Config.WHATSAPP_TOKEN
         self.phone_number_id = Config.WHATSAPP_PHONE_NUMBER_ID
         self.api_url = f"https://graph.facebook.com/v17.0/{self.phone_number_id}/messages"
+        self.upstream = get_upstream('whatsapp', 'WhatsApp', default_timeout=Config.WHATSAPP_TIMEOUT_SECONDS,
+                                     min_timeout=3, max_timeout=Config.WHATSAPP_TIMEOUT_SECONDS * 2,
+                                     is_transient=_is_transient_graph_error)
     
-    def send_message(self, to, message):
-        """Send message via WhatsApp Business API"""
+    def _post(self, headers, payload, timeout):
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response
+    
+    def _build_message(self, to, message):
         headers = {
             'Authorization': f'Bearer {self.token}',
             'Content-Type': 'application/json'
@@ -20,10 +35,15 @@ class WhatsAppWebhook:
             "to": to,
             "text": {"body": message}
         }
+        return headers, payload
+    
+    def send_message(self, to, message):
+        """Send message via WhatsApp Business API"""
+        headers, payload = self._build_message(to, message)
         
         try:
-            response = requests.post(self.api_url, headers=headers, json=payload)
-            response.raise_for_status()
+            # Not retried: a timed-out send may still have been delivered
+            self.upstream.call(lambda timeout: self._post(headers, payload, timeout))
             return True
         except Exception as e:
             print(f"Error sending message: {e}")